@@ -1,29 +1,38 @@
+import bisect
+import heapq
+import itertools
 import threading
 import time
 import traceback
+from concurrent.futures import Future
 from typing import Iterable, List, Any, Callable, Union, Tuple
 
 import dearpygui.dearpygui as dpg
 
 
-def get_text_size(text: str, *, wrap_width: float = -1.0, font: int | str = 0, **kwargs) -> list[float | int] | tuple[float | int, ...]:
-    strip_text = text.strip()
-    while 1:
-        size: list[float, float] = dpg.get_text_size(text, wrap_width=wrap_width, font=font, **kwargs)
+class TextSizeNotReady(RuntimeError):
+    """DPG returned no size: the first frame is not rendered yet or the font atlas is being rebuilt"""
 
-        if size is None:
-            continue
-        if size[1] == 0:
-            continue
-        if size[0] == 0 and len(strip_text) != 0:
-            continue
-        break
-    return size
+
+def get_text_size(text: str, *, wrap_width: float = -1.0, font: int | str = 0, **kwargs) -> list[float | int] | tuple[float | int, ...]:
+    """
+    Measures the text with dpg.get_text_size, trying at most `TextMeasurer.attempts` times.
+    :raises TextSizeNotReady: if DPG can not measure text yet
+    """
+    return TextMeasurer.measure_now(text, wrap_width=wrap_width, font=font, **kwargs)
 
 
 class CallInNextFrame:
-    __started = False
+    """
+    Calls the functions after the next frame is rendered.
+
+    The queue is guarded by a condition. The worker thread sleeps on it while the
+    queue is empty, so nothing runs while there is nothing to do, and wakes up as
+    soon as a function is added.
+    """
+    __thread = None
     now_frame_queue = []
+    _condition = threading.Condition()
 
     def __new__(cls, func):
         def decorator(*args, **kwargs):
@@ -33,21 +42,29 @@ class CallInNextFrame:
 
     @classmethod
     def append(cls, func, *args, **kwargs):
-        if cls.__started is False:
-            cls.__started = True
-            threading.Thread(target=cls._worker, daemon=True).start()
-        cls.now_frame_queue.append(
-            [func, args, kwargs]
-        )
+        with cls._condition:
+            if cls.__thread is None:
+                cls.__thread = threading.Thread(target=cls._worker, daemon=True)
+                cls.__thread.start()
+            cls.now_frame_queue.append(
+                [func, args, kwargs]
+            )
+            cls._condition.notify()
+
+    @classmethod
+    def get_queue_depth(cls) -> int:
+        """:return: number of functions waiting for the next frame"""
+        with cls._condition:
+            return len(cls.now_frame_queue)
 
     @classmethod
     def _worker(cls):
         while True:
-            if len(cls.now_frame_queue) == 0:
-                time.sleep(0.015)
-                continue
-            next_frame_queue = cls.now_frame_queue.copy()
-            cls.now_frame_queue.clear()
+            with cls._condition:
+                while len(cls.now_frame_queue) == 0:
+                    cls._condition.wait()
+                next_frame_queue = cls.now_frame_queue
+                cls.now_frame_queue = []
             dpg.split_frame()
             for func, args, kwargs in next_frame_queue:
                 try:
@@ -90,11 +107,279 @@ class CallWhenDPGStarted:
         del cls.functions_queue
 
 
+class TextMeasurer:
+    """
+    Measures text with dpg.get_text_size without spinning on it.
+
+    DPG returns None or a zero size before the first frame and while the font atlas is
+    rebuilt. `measure_now` tries `attempts` times and raises TextSizeNotReady. `measure`
+    returns a Future at once: cached sizes are resolved immediately, the others are
+    measured together after the next frame and retried for at most `max_frames` frames.
+    `call_when_ready` runs a layout now, or again in the next frames while text can not
+    be measured.
+
+    `provider` is called before dpg.get_text_size with the same arguments. It returns
+    the size, or None to measure with DPG (see ttf_metrics.TTFTextSize).
+    """
+    provider: Callable | None = None
+    attempts = 3
+    max_frames = 120
+    cache_size = 4096
+
+    measured = 0
+    cache_hits = 0
+    retries = 0  # Measurements that returned no size
+    failures = 0  # TextSizeNotReady raised or set on a future
+    deferred_calls = 0  # Calls of call_when_ready moved to a later frame
+
+    _cache: dict[tuple, list[float | int]] = {}
+    _pending: dict[tuple, list] = {}  # key: [future, frames waited]
+    _scheduled = False
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _key(text: str, wrap_width: float, font: int | str, kwargs: dict) -> tuple:
+        return text, wrap_width, font, tuple(sorted(kwargs.items()))
+
+    @classmethod
+    def _try(cls, text: str, wrap_width: float, font: int | str, kwargs: dict) -> list[float | int] | None:
+        size = None
+        if cls.provider is not None:
+            size = cls.provider(text, wrap_width=wrap_width, font=font, **kwargs)
+        if size is None:
+            size = dpg.get_text_size(text, wrap_width=wrap_width, font=font, **kwargs)
+        if size is None or size[1] == 0:
+            return None
+        if size[0] == 0 and len(text.strip()) != 0:
+            return None
+        return size
+
+    @classmethod
+    def _store(cls, key: tuple, size: list[float | int]):
+        if len(cls._cache) >= cls.cache_size:
+            cls._cache.clear()
+        cls._cache[key] = size
+        cls.measured += 1
+
+    @classmethod
+    def measure_now(cls, text: str, *, wrap_width: float = -1.0, font: int | str = 0, **kwargs) -> list[float | int]:
+        key = cls._key(text, wrap_width, font, kwargs)
+        size = cls._cache.get(key, None)
+        if size is not None:
+            cls.cache_hits += 1
+            return size
+
+        for _ in range(cls.attempts):
+            size = cls._try(text, wrap_width, font, kwargs)
+            if size is not None:
+                cls._store(key, size)
+                return size
+            cls.retries += 1
+        cls.failures += 1
+        raise TextSizeNotReady(f'DPG can not measure {text!r} yet (font: {font})')
+
+    @classmethod
+    def measure(cls, text: str, *, wrap_width: float = -1.0, font: int | str = 0, **kwargs) -> Future:
+        """:return: Future of the size, resolved now if the size is cached"""
+        key = cls._key(text, wrap_width, font, kwargs)
+        with cls._lock:
+            size = cls._cache.get(key, None)
+            if size is not None:
+                cls.cache_hits += 1
+                future = Future()
+                future.set_result(size)
+                return future
+
+            pending = cls._pending.get(key, None)
+            if pending is None:
+                pending = cls._pending[key] = [Future(), 0]
+            if not cls._scheduled:
+                cls._scheduled = True
+                CallInNextFrame.append(cls._resolve_pending)
+            return pending[0]
+
+    @classmethod
+    def _resolve_pending(cls):
+        with cls._lock:
+            cls._scheduled = False
+            pending = list(cls._pending.items())
+
+        resolved = {}
+        for key, (future, frames) in pending:
+            text, wrap_width, font, kwargs = key
+            try:
+                size = cls._try(text, wrap_width, font, dict(kwargs))
+            except Exception as error:
+                resolved[key] = (future.set_exception, error)
+                continue
+            if size is not None:
+                cls._store(key, size)
+                resolved[key] = (future.set_result, size)
+                continue
+
+            cls.retries += 1
+            if frames + 1 >= cls.max_frames:
+                cls.failures += 1
+                resolved[key] = (future.set_exception, TextSizeNotReady(f'DPG can not measure {text!r} (font: {font})'))
+
+        with cls._lock:
+            for key, _ in pending:
+                if key in resolved:
+                    del cls._pending[key]
+                else:
+                    cls._pending[key][1] += 1
+            if len(cls._pending) != 0 and not cls._scheduled:
+                cls._scheduled = True
+                CallInNextFrame.append(cls._resolve_pending)
+        for set_result, result in resolved.values():
+            set_result(result)
+
+    @classmethod
+    def call_when_ready(cls, func, *args):
+        """Calls the function now, or in the first frame in which it does not raise TextSizeNotReady"""
+        if not CallWhenDPGStarted.STARTUP_DONE:
+            CallWhenDPGStarted.append(cls.call_when_ready, func, *args)
+            return
+        try:
+            func(*args)
+        except TextSizeNotReady:
+            cls.deferred_calls += 1
+            CallInNextFrame.append(cls.call_when_ready, func, *args)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._cache.clear()
+
+    @classmethod
+    def get_stats(cls) -> dict[str, int]:
+        return dict(measured=cls.measured, cache_hits=cls.cache_hits, retries=cls.retries, failures=cls.failures,
+                    deferred_calls=cls.deferred_calls, pending=len(cls._pending))
+
+
+class VisibilityWatcher:
+    """
+    Calls a function once an item becomes visible.
+
+    All the pending items are bound to one item_handler_registry with a single visible
+    handler, instead of a registry for every item, and are kept in one dict. DPG checks the
+    visibility while it draws the items, so no Python code runs for the items that are not
+    visible. The handler only collects the visible items, their callbacks are called together
+    once per frame.
+    """
+    last_flush_time: float = 0  # Seconds taken by the last batch, callbacks included
+    last_batch_size: int = 0
+
+    _lock = threading.RLock()
+    _registry: int | str = None
+    _pending: dict[int | str, list] = {}  # item: [watched item, callback, args]
+    _watchers: dict[int | str, set] = {}  # watched item: items that wait for it
+    _visible: set = set()
+    _flush_scheduled = False
+    _prune_size = 64  # Pending items are checked for deleted ones when their number doubles
+
+    @classmethod
+    def add(cls, item: int | str, watched_item: int | str, callback, *args):
+        """
+        Calls `callback(*args)` once `watched_item` is visible, unless `item` is deleted before.
+        Note: a handler registry already bound to `watched_item` is replaced.
+        """
+        with cls._lock:
+            if cls._registry is None:
+                with dpg.item_handler_registry() as cls._registry:
+                    dpg.add_item_visible_handler(callback=lambda s, watched: cls._on_visible(watched))
+            if len(cls._pending) >= cls._prune_size:
+                cls._prune()
+            cls._pending[item] = [watched_item, callback, args]
+            cls._watchers.setdefault(watched_item, set()).add(item)
+        dpg.bind_item_handler_registry(watched_item, cls._registry)
+
+    @classmethod
+    def set_args(cls, item: int | str, *args) -> bool:
+        """
+        Replaces the arguments of the callback of a pending item.
+        :return: False if the item is not pending
+        """
+        with cls._lock:
+            pending = cls._pending.get(item, None)
+            if pending is None:
+                return False
+            pending[2] = args
+            return True
+
+    @classmethod
+    def remove(cls, item: int | str) -> bool:
+        """
+        :return: False if the item was not pending
+        """
+        with cls._lock:
+            pending = cls._pending.pop(item, None)
+            if pending is None:
+                return False
+            watched_item = pending[0]
+            items = cls._watchers.get(watched_item, set())
+            items.discard(item)
+            if len(items) == 0:
+                cls._watchers.pop(watched_item, None)
+                if dpg.does_item_exist(watched_item):
+                    dpg.bind_item_handler_registry(watched_item, 0)
+            return True
+
+    @classmethod
+    def get_pending_count(cls) -> int:
+        with cls._lock:
+            return len(cls._pending)
+
+    @classmethod
+    def _prune(cls):
+        for item in [item for item, pending in cls._pending.items()
+                     if not dpg.does_item_exist(item) or not dpg.does_item_exist(pending[0])]:
+            cls.remove(item)
+        cls._prune_size = max(64, len(cls._pending) * 2)
+
+    @classmethod
+    def _on_visible(cls, watched_item: int | str):
+        with cls._lock:
+            if watched_item not in cls._watchers:
+                return
+            cls._visible.add(watched_item)
+            if not cls._flush_scheduled:
+                cls._flush_scheduled = True
+                CallInNextFrame.append(cls._flush)
+
+    @classmethod
+    def _flush(cls):
+        started = time.perf_counter()
+        with cls._lock:
+            cls._flush_scheduled = False
+            ready = []
+            for watched_item in cls._visible:
+                for item in list(cls._watchers.get(watched_item, ())):
+                    pending = cls._pending[item]
+                    cls.remove(item)
+                    if dpg.does_item_exist(item):
+                        ready.append(pending)
+            cls._visible = set()
+
+        for _, callback, args in ready:
+            try:
+                callback(*args)
+            except Exception:
+                traceback.print_exc()
+        cls.last_batch_size = len(ready)
+        cls.last_flush_time = time.perf_counter() - started
+
+
+from . import attribute_types
+from . import drawlist_backend
 from . import font_attributes
+from . import layout
 from . import line_atributes
 from . import parser
 from . import text_attributes
 from . import text_entities
+from . import text_size
+from . import ttf_metrics
 from .font_attributes import set_font_registry, set_add_font_function, set_font
 
 
@@ -112,64 +397,163 @@ def is_in_container(dpg_item: int | str, containers_list: Iterable[str]) -> bool
             return False
 
 
-def wrap_text_entity(text: text_entities.StrEntity | text_entities.TextEntity, width: int | float = -1) -> text_entities.LineEntity:
-    def get_width(str_entity: text_entities.StrEntity | text_entities.TextEntity) -> int | float:
-        return text_entities.LineEntity.get_width(str_entity)
+class _GreedyLineBreaker:
+    """
+    Breaks one paragraph of a SpanText into lines keeping a running width of the current line.
 
-    def to_words(str_entity: text_entities.StrEntity | text_entities.TextEntity) -> list[text_entities.StrEntity | text_entities.TextEntity]:
+    Words and lines are (start, end) ranges over the backing string. The paragraph is
+    measured once into prefix widths from the cached glyph advances, so any range is
+    measured with one subtraction. Words longer than the wrap width are split with a
+    binary search over the prefix widths. Only the finished lines become StrEntity runs.
+    """
+    def __init__(self, print_text: text_entities.LineEntity, span_text: text_entities.SpanText, width: int | float,
+                 widths_cache: dict | None = None):
+        self.print_text = print_text
+        self.span_text = span_text
+        self.text = span_text.text
+        self.width = width
+        self.widths_cache = widths_cache
+        self.line_attributes: dict[text_entities.AttributeController, list] = {}
+        self._clear_sentence()
+
+    def _clear_sentence(self):
+        self.sentence_start = None
+        self.sentence_end = None
+        self.sentence_width = 0
+        self.sentence_attributes = []
+        self.sentence_last_run = -1
+
+    def _measure(self, start: int, end: int):
+        self.start = start
+        self.runs = self.span_text.get_runs(start, end)
+        self.run_ends = [run_end for _, run_end, _ in self.runs]
+        fonts = tuple(style.get_font() for _, _, style in self.runs)
+        text = self.text[start:end]
+        key = (text, fonts, tuple(run_end - start for run_end in self.run_ends))
+        prefix_widths = None
+        if self.widths_cache is not None:
+            prefix_widths = self.widths_cache.get(key, None)
+        if prefix_widths is None:
+            advances = []
+            for (run_start, run_end, _), font in zip(self.runs, fonts):
+                advances.extend(text_size.get_text_advances(self.text[run_start:run_end], font=font))
+            prefix_widths = list(itertools.accumulate(advances, initial=0))
+            if self.widths_cache is not None:
+                self.widths_cache[key] = prefix_widths
+        self.prefix_widths = prefix_widths
+
+        self.runs_attributes = []
+        for _, _, style in self.runs:
+            line_attributes = self.line_attributes.get(style, None)
+            if line_attributes is None:
+                line_attributes = self.line_attributes[style] = [attribute for attribute in style
+                                                                 if isinstance(attribute, text_entities.LineAttribute)]
+            self.runs_attributes.append(line_attributes)
+
+    def _width(self, start: int, end: int) -> float | int:
+        return self.prefix_widths[end - self.start] - self.prefix_widths[start - self.start]
+
+    def _run_of(self, index: int) -> int:
+        return bisect.bisect_right(self.run_ends, index)
+
+    def _range_attributes(self, start: int, end: int, last_run: int = -1) -> list[text_entities.Attribute]:
+        attributes = []
+        for run in range(max(self._run_of(start), last_run + 1), self._run_of(end - 1) + 1):
+            attributes.extend(self.runs_attributes[run])
+        return attributes
+
+    def _fits(self, width: float | int, attributes: list[text_entities.Attribute]) -> bool:
+        attributes_width = text_entities.LineEntity.get_attributes_width(attributes)
+        if attributes_width is None:
+            return True
+        return width + attributes_width <= self.width
+
+    def to_words(self, start: int, end: int) -> list[tuple[int, int]]:
+        """:return: (start, end) of the words and of the spaces between them"""
+        text = self.text
         words_list = []
-        word = None
-        chars = str_entity.chars()
-        for char in chars:
-            if str(char) == " ":
-                if word is not None:
-                    words_list.append(word)
-                words_list.append(char)
-                word = None
-            else:
-                if word is None:
-                    word = char
-                else:
-                    word = word + char
-        if word is not None:
-            words_list.append(word)
+        space = text.find(' ', start, end)
+        while space != -1:
+            if space > start:
+                words_list.append((start, space))
+            words_list.append((space, space + 1))
+            start = space + 1
+            space = text.find(' ', start, end)
+        if start < end:
+            words_list.append((start, end))
         return words_list
 
-    print_text = text_entities.LineEntity()
-    paragraphs_list = text.split('\n')
-    if width < 0:
-        for paragraph in paragraphs_list:
-            print_text.append(paragraph)
-        return print_text
-
-    for paragraph in paragraphs_list:
-        sentence = text_entities.StrEntity('')
-        if len(paragraph) == 0:
-            print_text.append(paragraph)
-            continue
+    def _append(self, start: int | None, end: int | None):
+        if start is None:
+            self.print_text.append(text_entities.StrEntity(''))
+            return
+        self.print_text.append(self.span_text.to_entity(start, end))
+
+    def _set_sentence(self, start: int, end: int, width: float | int, attributes: list[text_entities.Attribute]):
+        self.sentence_start = start
+        self.sentence_end = end
+        self.sentence_width = width
+        self.sentence_attributes = attributes
+        self.sentence_last_run = self._run_of(end - 1)
+
+    def _split_long_word(self, start: int, end: int):
+        while True:
+            # The first character is always taken, even if it does not fit alone
+            low, high = start + 1, end
+            while low < high:
+                middle = (low + high + 1) // 2
+                if self._fits(self._width(start, middle), self._range_attributes(start, middle)):
+                    low = middle
+                else:
+                    high = middle - 1
 
-        words_list = to_words(paragraph)
-        for word in words_list:
-            sentence_with_next_word = sentence + word
-            if get_width(sentence_with_next_word) <= width:
-                sentence = sentence_with_next_word
+            if low < end:
+                self._append(start, low)
+                start = low
                 continue
-            if len(sentence) != 0:
-                print_text.append(sentence)
-                if get_width(word) <= width:
-                    sentence = word
+            self._set_sentence(start, end, self._width(start, end), self._range_attributes(start, end))
+            break
+
+    def wrap(self, start: int, end: int):
+        self._measure(start, end)
+        for word_start, word_end in self.to_words(start, end):
+            word_width = self._width(word_start, word_end)
+            word_attributes = self._range_attributes(word_start, word_end, last_run=self.sentence_last_run)
+            if self._fits(self.sentence_width + word_width, self.sentence_attributes + word_attributes):
+                if self.sentence_start is None:
+                    self.sentence_start = word_start
+                self.sentence_end = word_end
+                self.sentence_width += word_width
+                self.sentence_attributes.extend(word_attributes)
+                self.sentence_last_run = self._run_of(word_end - 1)
+                continue
+
+            if self.sentence_start is not None:
+                self._append(self.sentence_start, self.sentence_end)
+                word_attributes = self._range_attributes(word_start, word_end)
+                if self._fits(word_width, word_attributes):
+                    self._set_sentence(word_start, word_end, word_width, word_attributes)
                     continue
 
-            sentence = text_entities.StrEntity('')
-            for i, char in enumerate(word.chars()):
-                sentence_with_next_char = sentence + char
-                if get_width(sentence_with_next_char) <= width:
-                    sentence = sentence_with_next_char
-                else:
-                    if len(sentence) > 0:
-                        print_text.append(sentence)
-                    sentence = char
-        print_text.append(sentence)
+            self._clear_sentence()
+            self._split_long_word(word_start, word_end)
+        self._append(self.sentence_start, self.sentence_end)
+
+
+def wrap_text_entity(text: text_entities.SpanText | text_entities.StrEntity | text_entities.TextEntity, width: int | float = -1,
+                     widths_cache: dict | None = None) -> text_entities.LineEntity:
+    """
+    :param widths_cache: dict to keep the measured widths of the text in, so the same text can be wrapped again cheaply.
+    """
+    if not isinstance(text, text_entities.SpanText):
+        text = text_entities.SpanText.from_entity(text)
+
+    print_text = text_entities.LineEntity()
+    for start, end in text.paragraphs():
+        if width < 0 or start == end:
+            print_text.append(text.to_entity(start, end))
+            continue
+        _GreedyLineBreaker(print_text, text, width, widths_cache=widths_cache).wrap(start, end)
 
     return print_text
 
@@ -247,12 +631,22 @@ class _ConvertedMessageEntity:
 
 
 class MarkdownText:
-    text_entity: text_entities.TextEntity | text_entities.StrEntity
+    text_entity: text_entities.SpanText
+    display_lists_cache_size = 8
+    sliced_render = True  # False renders the text in one frame even if LineEntity.frame_budget is set
     black_list_render_containers = ("mvAppItemType::mvTab", # Used to prevent rendering in some containers
                                     "mvAppItemType::mvTabBar",
                                     "mvAppItemType::mvTreeNode")
 
     def __init__(self, markdown_text: str):
+        self.markdown_text = markdown_text
+        self.widths_cache = {}  # Paragraph: prefix widths, for the fonts of one font generation
+        self.widths_generation = font_attributes.FontAttribute.generation
+        self.virtual_texts: dict[int | str, text_entities.VirtualLineEntity] = {}
+        self.drawlist_texts: dict[int | str, drawlist_backend.DrawlistText] = {}
+        self.pending_layouts: dict[int | str, int | float] = {}  # Group added but not wrapped yet: wrap width
+        self.display_lists: dict[tuple, layout.DisplayList] = {}  # (wrap, font generation): DisplayList
+
         clear_text, attributes = parser.parse(markdown_text)
         for i in range(len(attributes)):
             attributes[i] = _ConvertedMessageEntity(attributes[i])
@@ -266,39 +660,50 @@ class MarkdownText:
         attribute_points = list(set(attribute_points))
         attribute_points.sort()
 
-        if len(attribute_points) == 0:
-            self.text_entity = text_entities.StrEntity(clear_text)
-        else:
-            self.text_entity = text_entities.TextEntity()
+        self.text_entity = text_entities.SpanText()
+
+        # Sweep over the sorted points keeping the set of entities that cover the
+        # current segment (offset < point <= end). Separators only match their own offset.
+        attribute_objects = [entity.object for entity in attributes]
+        entities_by_offset = sorted(range(len(attributes)), key=lambda index: attributes[index].offset)
+        separators_by_point = {}
+        for index, entity in enumerate(attributes):
+            if isinstance(entity.entity, parser.MessageEntitySeparator):
+                separators_by_point.setdefault(entity.offset, []).append(index)
 
+        active_entities = set()
+        active_ends = []
+        next_entity = 0
         for i, point in enumerate(attribute_points):
-            str_attributes = []
-            for entity in attributes:
-                if point == entity:
-                    str_attributes.append(entity.object)
+            while next_entity < len(entities_by_offset) and attributes[entities_by_offset[next_entity]].offset < point:
+                index = entities_by_offset[next_entity]
+                next_entity += 1
+                if isinstance(attributes[index].entity, parser.MessageEntitySeparator):
+                    continue
+                active_entities.add(index)
+                heapq.heappush(active_ends, (attributes[index].end, index))
+            while len(active_ends) != 0 and active_ends[0][0] < point:
+                active_entities.discard(heapq.heappop(active_ends)[1])
+
+            point_entities = active_entities.union(separators_by_point.get(point, ()))
+            str_attributes = [attribute_objects[index] for index in sorted(point_entities)]
 
             past_point = attribute_points[i - 1] if i != 0 else 0
 
-            str_entity = text_entities.StrEntity(clear_text[past_point:point:])
+            text = clear_text[past_point:point:]
             if line_atributes.Separator in str_attributes:
                 del str_attributes[str_attributes.index(line_atributes.Separator)]
-                if len(str(str_entity)) > 0:
-                    str_entity = text_entities.StrEntity(str(str_entity).removesuffix('\n'))
-                    str_entity.set_attributes(str_attributes)
-                    self.text_entity.append(str_entity)
-
+                self.text_entity.append(text.removesuffix('\n'), str_attributes)
                 if point != 0:
-                    self.text_entity.append(
-                        text_entities.StrEntity('\n')
-                    )
-                str_entity = text_entities.StrEntity(' ')
-                str_entity.set_attributes([line_atributes.Separator])  # noqa
-                self.text_entity.append(str_entity)
+                    self.text_entity.append('\n')
+                self.text_entity.append(' ', [line_atributes.Separator])  # noqa
+                if point == 0 and len(clear_text) != 0:  # The new line after a leading separator is stripped
+                    self.text_entity.append('\n')
             else:
-                str_entity.set_attributes(str_attributes)
-                self.text_entity.append(str_entity)
+                self.text_entity.append(text, str_attributes)
 
-    def add(self, wrap: int | float = -1, parent=0, render_on_element_visible: int | str | bool | None = True) -> int | str:
+    def add(self, wrap: int | float = -1, parent=0, render_on_element_visible: int | str | bool | None = True,
+            virtualize: bool = False, drawlist: bool = False) -> int | str:
         """
         :param wrap: Number of pixels from the start of the item until wrapping starts.
         :param parent: Parent to add this item to. (runtime adding)
@@ -307,64 +712,278 @@ class MarkdownText:
             - True: Default behavior. Renders the element after it becomes visible.
             - False: Explicitly renders the element immediately after creation. Caution: May cause incorrect
               rendering if the element is within a dpg.tab or dpg.tree_node containers or parent container is not visible.
-            - int or str: Tag of another element. The visibility handler will be attached to the specified element.
-              Note: If the target element already has a visibility handler, it will be replaced.
-        :return: group with rendered text
+            - int or str: Tag of another element. The element is rendered after that element becomes visible.
+            Pending elements are watched by VisibilityWatcher.
+            The text is wrapped once DPG can measure it (see TextMeasurer.call_when_ready).
+        :param virtualize: Create items only for the lines inside the scroll window of the parent
+            (see text_entities.VirtualLineEntity). For long documents.
+        :param drawlist: Draw the text into a single dpg.drawlist instead of creating text and group items
+            (see drawlist_backend.DrawlistText). For read-only text, links stay clickable.
+        :return: group with rendered text (the drawlist if `drawlist` is True)
         """
-        print_text: text_entities.LineEntity = wrap_text_entity(self.text_entity, width=wrap)
+        if drawlist:
+            drawlist_text = drawlist_backend.DrawlistText()
+            dpg_drawlist = drawlist_text.add(parent=parent)
+            self.drawlist_texts[dpg_drawlist] = drawlist_text
+            self.pending_layouts[dpg_drawlist] = wrap
+            TextMeasurer.call_when_ready(self._draw, dpg_drawlist)
+            return dpg_drawlist
 
         with dpg.group(parent=parent, horizontal=True) as group:
-            text_group = dpg.add_group(parent=group)
-            attributes_group = dpg.add_group(parent=group)
+            dpg.add_group(parent=group)  # Text group
+            dpg.add_group(parent=group)  # Attributes group
 
         if render_on_element_visible is None:
             render_on_element_visible = is_in_container(group, self.black_list_render_containers)
 
-        if render_on_element_visible is not False:
-            with dpg.item_handler_registry() as widget_handler:
-                dpg.add_item_visible_handler(callback=self._render_after_visible_callback,
-                                             user_data=(widget_handler, (print_text, group, text_group, attributes_group)))
+        self.pending_layouts[group] = wrap
+        TextMeasurer.call_when_ready(self._layout, group, virtualize, render_on_element_visible)
+        return group
 
-            if render_on_element_visible is True:
-                dpg.bind_item_handler_registry(group, widget_handler)
-            else:
-                dpg.bind_item_handler_registry(render_on_element_visible, widget_handler)
+    def _wrap(self, wrap: int | float) -> text_entities.LineEntity:
+        """
+        Wraps the text with the widths measured by the previous wrappings. The widths are kept only
+        until the font is changed, so the cache holds at most one entry for every paragraph.
+        """
+        if self.widths_generation != font_attributes.FontAttribute.generation:
+            self.widths_cache.clear()
+            self.widths_generation = font_attributes.FontAttribute.generation
+        return wrap_text_entity(self.text_entity, width=wrap, widths_cache=self.widths_cache)
 
-            return group
+    def get_display_list(self, wrap: int | float = -1) -> layout.DisplayList:
+        """
+        Wraps the text and lays it out without creating DPG items (see layout.DisplayList).
+        The last `display_lists_cache_size` layouts are kept until the font is changed.
+        :param wrap: Number of pixels from the start of the item until wrapping starts.
+        """
+        key = (wrap, font_attributes.FontAttribute.generation)
+        display_list = self.display_lists.get(key, None)
+        if display_list is None:
+            print_text = self._wrap(wrap)
+            display_list = layout.DisplayList.create(print_text, wrap)
+            if len(self.display_lists) >= self.display_lists_cache_size:
+                del self.display_lists[next(iter(self.display_lists))]
+            self.display_lists[key] = display_list
+        return display_list
+
+    def _draw(self, dpg_drawlist: int | str):
+        if not dpg.does_item_exist(dpg_drawlist):
+            self.pending_layouts.pop(dpg_drawlist, None)
+            return
+        wrap = self.pending_layouts[dpg_drawlist]
+        display_list = self.get_display_list(wrap)
+        del self.pending_layouts[dpg_drawlist]
+        self.drawlist_texts[dpg_drawlist].draw(display_list, wrap)
+
+    def _layout(self, group: int | str, virtualize: bool, render_on_element_visible: int | str | bool):
+        """Wraps the text for a group created by `add`, once DPG can measure it, and renders or watches it"""
+        if not dpg.does_item_exist(group):
+            self.pending_layouts.pop(group, None)
+            return
+        # The group stays pending until it is rendered: if measuring raises TextSizeNotReady,
+        # the layout is retried (at the width of a reflow in between)
+        wrap = self.pending_layouts[group]
+        print_text = self._wrap(wrap)
+        text_group, attributes_group = dpg.get_item_children(group, 1)[:2:]
+        if virtualize:
+            print_text = self.virtual_texts[group] = text_entities.VirtualLineEntity(print_text)
 
-        if not CallWhenDPGStarted.STARTUP_DONE:
-            CallWhenDPGStarted.append(self._render, print_text, group, text_group, attributes_group)
+        if render_on_element_visible is not False:
+            watched_item = group if render_on_element_visible is True else render_on_element_visible
+            VisibilityWatcher.add(group, watched_item, TextMeasurer.call_when_ready,
+                                  self._render, print_text, group, text_group, attributes_group)
         else:
             self._render(print_text, group, text_group, attributes_group)
-        return group
+        del self.pending_layouts[group]
 
-    @staticmethod
-    def _render(print_text: text_entities.LineEntity, group: int | str, text_group: int | str, attributes_group: int | str):
-        dpg.bind_item_theme(group, text_entities.AttributeController.dpg_group_theme)
+    def reflow(self, group: int | str, wrap: int | float = -1):
+        """
+        Wraps the already parsed text again at a new width and re-renders it into
+        a group created by `add`. The markdown is not parsed again.
+        :param group: group returned by `add`
+        :param wrap: Number of pixels from the start of the item until wrapping starts.
+        """
+        if group in self.pending_layouts:  # Not wrapped yet, it will be wrapped at the new width
+            self.pending_layouts[group] = wrap
+            return
+        TextMeasurer.call_when_ready(self._reflow, group, wrap)
+
+    def _reflow(self, group: int | str, wrap: int | float):
+        if not dpg.does_item_exist(group):
+            return
+        # The wrapped lines have their own attribute connectors (see LineEntity), so the
+        # state of the other groups of the text is kept
+        drawlist_text = self.drawlist_texts.get(group, None)
+        if drawlist_text is not None:
+            drawlist_text.draw(self.get_display_list(wrap), wrap)
+            return
+
+        print_text = self._wrap(wrap)
+        text_group, attributes_group = dpg.get_item_children(group, 1)[:2:]
+        virtual_text = self.virtual_texts.get(group, None)
+        if virtual_text is not None:
+            virtual_text.delete()
+            print_text = self.virtual_texts[group] = text_entities.VirtualLineEntity(print_text)
+
+        if VisibilityWatcher.set_args(group, self._render, print_text, group, text_group, attributes_group):
+            return  # Not rendered yet, render the new layout when the group becomes visible
+
+        dpg.delete_item(text_group, children_only=True)
+        dpg.delete_item(attributes_group, children_only=True)
+        self._render(print_text, group, text_group, attributes_group)
+
+    def delete(self, group: int | str):
+        """
+        Deletes a group created by `add` and forgets everything that was kept for it.
+        :param group: group returned by `add`
+        """
+        self.pending_layouts.pop(group, None)
+        self.drawlist_texts.pop(group, None)
+        VisibilityWatcher.remove(group)
+        virtual_text = self.virtual_texts.pop(group, None)
+        if virtual_text is not None:
+            virtual_text.delete()
+        attribute_types.LinkIndex.remove(group)  # A drawlist
+        if not dpg.does_item_exist(group):
+            return
+        children = dpg.get_item_children(group, 1)
+        if len(children) >= 2:  # Not a drawlist
+            text_group, attributes_group = children[:2:]
+            attribute_types.LinkIndex.remove(text_group)
+            attribute_types.DecorationLayer.remove(attributes_group)
+        dpg.delete_item(group)
+
+    def _render(self, print_text: text_entities.LineEntity, group: int | str, text_group: int | str, attributes_group: int | str):
+        dpg.bind_item_theme(group, text_entities.AttributeController.get_group_theme())
+        if not self.sliced_render:
+            print_text.frame_budget = None
         print_text.render(parent=text_group, attributes_group=attributes_group)
 
-    @staticmethod
-    def _render_after_visible_callback(sender, app_data):
-        user_data = dpg.get_item_user_data(sender)
-        if user_data is None:
+
+class MarkdownStream:
+    """
+    Markdown text that grows chunk by chunk, e.g. a streamed chat response.
+
+    Every finished top-level block is rendered once as its own MarkdownText. Only the
+    last block, which the next chunks can still change, is parsed and rendered again.
+    Blocks are rendered in one frame (see MarkdownText.sliced_render), so the text does
+    not blink while the last block is replaced. Appends are coalesced, so the text is
+    updated at most once per frame.
+
+    A finished block gets the blank lines that MarkdownText puts between it and the next
+    block, so the text is spaced as if it was added at once. Link reference definitions
+    ([label]: url) of finished blocks are used by the next blocks, but a reference
+    defined after the block that uses it is never resolved.
+    """
+    def __init__(self, wrap: int | float = -1, parent: int | str = 0, render_on_element_visible: int | str | bool | None = False):
+        """
+        :param wrap: Number of pixels from the start of the item until wrapping starts.
+        :param parent: Parent to add this item to. (runtime adding)
+        :param render_on_element_visible: Passed to `MarkdownText.add` for every block. Defaults to False,
+            so the last block does not disappear for a frame on every update.
+        """
+        self.wrap = wrap
+        self.render_on_element_visible = render_on_element_visible
+        self.blocks: list[tuple[MarkdownText, int | str]] = []
+        self.blocks_text = ''
+        self.link_definitions = ''  # Link reference definitions of the finished blocks, as Markdown
+        self.tail: tuple[MarkdownText, int | str] | None = None
+        self.tail_text = ''
+
+        self._pending_chunks = []
+        self._update_scheduled = False
+        self._lock = threading.Lock()
+
+        self.group = dpg.add_group(parent=parent)
+        dpg.bind_item_theme(self.group, text_entities.AttributeController.get_group_theme())
+
+    @property
+    def markdown_text(self) -> str:
+        with self._lock:
+            pending_text = ''.join(self._pending_chunks)
+        return self.blocks_text + self.tail_text + pending_text
+
+    def append(self, chunk: str):
+        """
+        Appends Markdown text. Can be called from any thread.
+        """
+        if len(chunk) == 0:
             return
-        
-        dpg.set_item_user_data(sender, None)
+        with self._lock:
+            self._pending_chunks.append(chunk)
+            if self._update_scheduled:
+                return
+            self._update_scheduled = True
+        CallInNextFrame.append(self._update)
+
+    def reflow(self, wrap: int | float = -1):
+        """
+        Wraps all blocks again at a new width without parsing them.
+        """
+        self.wrap = wrap
+        for markdown_text, group in self.blocks:
+            markdown_text.reflow(group, wrap=wrap)
+        if self.tail is not None:
+            self.tail[0].reflow(self.tail[1], wrap=wrap)
 
-        widget_handler = user_data[0]
-        print_text, group, text_group, attributes_group = user_data[1]
+    def _add_block(self, block: MarkdownText) -> tuple[MarkdownText, int | str]:
+        block.sliced_render = False  # It replaces the old tail, which is deleted in this frame
+        return block, block.add(wrap=self.wrap, parent=self.group,
+                                render_on_element_visible=self.render_on_element_visible)
 
-        dpg.delete_item(sender)
-        dpg.delete_item(widget_handler)
+    @staticmethod
+    def _get_line_count(markdown_text: MarkdownText) -> int:
+        text = markdown_text.text_entity.text
+        return text.count('\n') + 1 if len(text) != 0 else 0
+
+    def _update(self):
+        with self._lock:
+            self._update_scheduled = False
+            self.tail_text += ''.join(self._pending_chunks)
+            self._pending_chunks.clear()
+        if not dpg.does_item_exist(self.group):
+            return
 
-        MarkdownText._render(print_text, group, text_group, attributes_group)
+        # New items are added after the old tail, which is deleted last so nothing blinks
+        tail = None
+        finished_length = parser.get_last_block_offset(self.tail_text)
+        if finished_length != 0:
+            finished_text = self.tail_text[:finished_length:]
+            # Only the complete lines of the next block are known not to change its kind (e.g. '-' to '---')
+            next_text = self.tail_text[finished_length:self.tail_text.rfind('\n') + 1:]
+            joined = MarkdownText(self.link_definitions + finished_text + next_text)
+            block = MarkdownText(self.link_definitions + finished_text)
+            self.link_definitions += parser.get_link_definitions(finished_text)
+            self.blocks_text += finished_text
+            self.tail_text = self.tail_text[finished_length::]
+
+            if self._get_line_count(block) != 0:  # Not only blank lines or link reference definitions
+                # Parsed alone, a block loses the blank lines after it (e.g. after a code block)
+                next_block = MarkdownText(self.link_definitions + next_text)
+                blank_lines = self._get_line_count(joined) - self._get_line_count(block) - self._get_line_count(next_block)
+                block.text_entity.append('\n' * max(blank_lines, 0))
+                self.blocks.append(self._add_block(block))
+
+        if tail is None:
+            tail = MarkdownText(self.link_definitions + self.tail_text)
+        old_tail = self.tail
+        self.tail = self._add_block(tail)
+        if old_tail is not None:
+            self._delete_block(old_tail)
+
+    @staticmethod
+    def _delete_block(block: tuple[MarkdownText, int | str]):
+        markdown_text, group = block
+        markdown_text.delete(group)
 
 
 def add_text(markdown_text: str,
              wrap: float | int = -1,
              parent: int | str = 0,
              pos: list[int | float, int | float] | tuple[int | float, int | float] = None,
-             render_on_element_visible: int | str | bool | None = True) -> int:
+             render_on_element_visible: int | str | bool | None = True,
+             virtualize: bool = False,
+             drawlist: bool = False) -> int:
     """ Adds Markdown text.
     :param wrap: Number of pixels from the start of the item until wrapping starts.
     :param parent: Parent to add this item to. (runtime adding)
@@ -376,9 +995,12 @@ def add_text(markdown_text: str,
           rendering if the element is within a dpg.tab or dpg.tree_node containers or parent container is not visible.
         - int or str: Tag of another element. The visibility handler will be attached to the specified element.
           Note: If the target element already has a visibility handler, it will be replaced.
-    :return: group with rendered Markdown text
+    :param virtualize: Create items only for the lines inside the scroll window of the parent, for long documents.
+    :param drawlist: Draw the text into a single dpg.drawlist instead of text and group items, for read-only text.
+    :return: group with rendered Markdown text (the drawlist if `drawlist` is True)
     """
-    rendered_group = MarkdownText(markdown_text=markdown_text).add(wrap=wrap, parent=parent, render_on_element_visible=render_on_element_visible)
+    rendered_group = MarkdownText(markdown_text=markdown_text).add(wrap=wrap, parent=parent, render_on_element_visible=render_on_element_visible,
+                                                                   virtualize=virtualize, drawlist=drawlist)
     if pos is not None:
         dpg.set_item_pos(rendered_group, pos)
     return rendered_group
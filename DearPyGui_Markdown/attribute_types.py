@@ -1,8 +1,10 @@
+import math
 import traceback
 
 import dearpygui.dearpygui as dpg
 
 from . import CallInNextFrame
+from .text_size import get_text_width, get_text_height
 
 font_registry = 0
 add_font = dpg.add_font
@@ -23,12 +25,141 @@ def math_round(number: float | int) -> int:
 
 
 class AttributeConnector(list):
-    handler: int | None = None
-
     def __hash__(self):
         return id(self)
 
 
+class DecorationLayer:
+    """
+    The drawlists of one rendered text. Decorations are drawn into them instead of
+    a positioned group with its own drawlist for every span.
+
+    The background drawlist is the first child of the text group, so code and pre
+    backgrounds stay behind the text. The foreground drawlist is in the attributes
+    group and holds the underlines, strikes, blockquote bars, bullets and borders.
+    Points are given relative to the top left corner of the text group, as computed
+    by the layout, so nothing has to be measured after the text is rendered.
+
+    Both drawlists are placed at the text group with `pos`. If the text group has
+    not been drawn yet, its position is unknown: the drawlists are hidden and
+    placed in the next frame.
+    """
+    _layers: dict[int | str, 'DecorationLayer'] = {}
+    _prune_size = 64  # Layers are checked for deleted groups when their number doubles
+
+    def __init__(self, text_group: int | str | None, attributes_group: int | str, origin: list | tuple | None = None):
+        self.text_group = text_group
+        self.attributes_group = attributes_group
+        self.origin = origin
+        self.drawlists = {}  # background: [drawlist, width, height]
+
+    @classmethod
+    def create(cls, text_group: int | str | None, attributes_group: int | str,
+               origin: list | tuple | None = None) -> 'DecorationLayer':
+        """
+        :param origin: position of the text group in window coordinates, if already known
+        """
+        if len(cls._layers) >= cls._prune_size:
+            cls._prune()
+        layer = cls._layers[attributes_group] = cls(text_group, attributes_group, origin)
+        return layer
+
+    @classmethod
+    def remove(cls, attributes_group: int | str):
+        """Forgets the layer of an attributes group that is deleted"""
+        cls._layers.pop(attributes_group, None)
+
+    @classmethod
+    def _prune(cls):
+        for key in [key for key, layer in cls._layers.items() if not dpg.does_item_exist(layer.attributes_group)]:
+            del cls._layers[key]
+        cls._prune_size = max(64, len(cls._layers) * 2)
+
+    @classmethod
+    def get(cls, attributes_group: int | str) -> 'DecorationLayer':
+        layer = cls._layers.get(attributes_group, None)
+        if layer is None:
+            layer = cls.create(None, attributes_group)
+        return layer
+
+    def get_text_group(self) -> int | str:
+        if self.text_group is None or not dpg.does_item_exist(self.text_group):
+            return self.attributes_group
+        return self.text_group
+
+    def get_drawlist(self, background: bool = False) -> int | str:
+        drawlist = self.drawlists.get(background, None)
+        if drawlist is not None and dpg.does_item_exist(drawlist[0]):
+            return drawlist[0]
+
+        text_group = self.get_text_group()
+        if self.origin is None and dpg.is_item_visible(text_group):
+            self.origin = dpg.get_item_pos(text_group)
+        if self.origin is not None:
+            kwargs = dict(pos=self.origin)
+        else:
+            kwargs = dict(show=False)
+        if background:
+            children = dpg.get_item_children(text_group, 1)
+            drawlist = dpg.add_drawlist(width=1, height=1, parent=text_group,
+                                        before=children[0] if len(children) != 0 else 0, **kwargs)
+        else:
+            drawlist = dpg.add_drawlist(width=1, height=1, parent=self.attributes_group, **kwargs)
+        self.drawlists[background] = [drawlist, 1, 1]
+        if self.origin is None:
+            self.place(drawlist)
+        return drawlist
+
+    @CallInNextFrame
+    def place(self, drawlist: int | str):
+        """Fallback for a text group that was not drawn yet: moves the drawlist to it once it is"""
+        if not dpg.does_item_exist(drawlist):  # Deleted by a reflow
+            return
+        if self.origin is None:
+            self.origin = dpg.get_item_pos(self.get_text_group())
+        dpg.configure_item(drawlist, pos=self.origin, show=True)
+
+    def _resize(self, points: list, margin: float | int = 0, background: bool = False) -> int | str:
+        drawlist = self.get_drawlist(background)
+        size = self.drawlists[background]
+        width = math.ceil(max(x for x, _ in points) + margin)
+        height = math.ceil(max(y for _, y in points) + margin)
+        if width > size[1] or height > size[2]:
+            size[1], size[2] = max(width, size[1]), max(height, size[2])
+            dpg.configure_item(drawlist, width=size[1], height=size[2])
+        return drawlist
+
+    def draw_line(self, p1, p2, thickness: float | int = 1, background: bool = False, **kwargs) -> int | str:
+        drawlist = self._resize([p1, p2], margin=thickness, background=background)
+        return dpg.draw_line(p1, p2, thickness=thickness, parent=drawlist, **kwargs)
+
+    def draw_quad(self, p1, p2, p3, p4, thickness: float | int = 1, background: bool = False, **kwargs) -> int | str:
+        drawlist = self._resize([p1, p2, p3, p4], margin=thickness, background=background)
+        return dpg.draw_quad(p1, p2, p3, p4, thickness=thickness, parent=drawlist, **kwargs)
+
+    def draw_rectangle(self, pmin, pmax, thickness: float | int = 1, background: bool = False, **kwargs) -> int | str:
+        drawlist = self._resize([pmin, pmax], margin=thickness, background=background)
+        return dpg.draw_rectangle(pmin, pmax, thickness=thickness, parent=drawlist, **kwargs)
+
+    def draw_polyline(self, points: list, thickness: float | int = 1, background: bool = False, **kwargs) -> int | str:
+        drawlist = self._resize(points, margin=thickness, background=background)
+        return dpg.draw_polyline(points, thickness=thickness, parent=drawlist, **kwargs)
+
+    def draw_circle(self, center, radius: float | int, thickness: float | int = 1, background: bool = False, **kwargs) -> int | str:
+        x, y = center
+        drawlist = self._resize([center, [x + radius, y + radius]], margin=thickness, background=background)
+        return dpg.draw_circle(center, radius, thickness=thickness, parent=drawlist, **kwargs)
+
+    def draw_text(self, pos, text: str, width: float | int, height: float | int, size: float | int, font=None,
+                  background: bool = False, **kwargs) -> int | str:
+        x, y = pos
+        drawlist = self._resize([pos, [x + width, y + height]], background=background)
+        dpg_text = dpg.draw_text(pos, text, size=size, parent=drawlist, **kwargs)
+        if font is not None:
+            dpg.bind_item_font(dpg_text, font)
+        return dpg_text
+
+
 class Attribute:
     attribute_connector: AttributeConnector | None = None
 
@@ -36,6 +167,17 @@ class Attribute:
     def object(self):
         return type(self)
 
+    def reset(self):
+        """Clears the state left by a previous render, so the attribute can be rendered again"""
+        if self.attribute_connector is not None:
+            self.attribute_connector.clear()
+
+    def copy(self) -> 'Attribute':
+        """:return: copy of the attribute for one rendered line, with the same attribute connector"""
+        attribute = object.__new__(type(self))
+        attribute.__dict__.update(self.__dict__)
+        return attribute
+
     def __eq__(self, other):
         if type(other) is type:
             return type(self) == other
@@ -46,16 +188,37 @@ class LineAttribute(Attribute):
     def get_width(self) -> int | float:
         ...
 
-    def render(self, text_height: int | float, parent=0, attributes_group=0):
-        ...
 
-    @CallInNextFrame
-    def post_render(self, attributes_group=0):
-        ...
+class FontMetrics:
+    """
+    Line metrics of one font, measured the first time they are needed and kept until
+    the next `set_font` of its FontAttribute.
+
+    DPG cannot measure text before the first frame, so the metrics are not measured
+    inside `get_font` but on the first `get_metrics` after it.
+    """
+    __slots__ = ('font', 'size', 'height', 'thickness', 'baseline', 'space_width', 'marker_width', 'task_width')
+    marker_symbols = 4  # Digits reserved for the index of an ordered list item
+
+    def __init__(self, font: int | str | None, size: int | None = None):
+        self.font = font
+        self.size = size
+        self.height = get_text_height(font=font)
+        self.thickness = self.height / 15  # Of the underline and strike lines
+        self.baseline = self.height - self.thickness + self.thickness / 5  # Y of the underline from the top of the line
+        self.space_width = get_text_width(' ', font=font)
+        self.marker_width = get_text_width(f"{'0' * self.marker_symbols}.  ", font=font)
+        self.task_width = (size or 0) + self.space_width * 2  # Checkbox of the font size and two spaces
+
+    def __repr__(self):
+        return f'<FontMetrics font: {self.font}, size: {self.size}, height: {self.height}>'
 
 
 class FontAttribute(Attribute):
+    generation = 0  # Changed by every set_font, so the fonts resolved for a style are resolved again
+    font_files: dict[int | str, tuple[str, int]] = {}  # Font: (file, size) of every created font
     _fonts: dict = None
+    _metrics: dict = None
 
     font_path: str
     font = None
@@ -65,9 +228,11 @@ class FontAttribute(Attribute):
     def set_font(cls, path, size: float | int):
         cls.font_path = path
         cls._fonts = {}
+        cls._metrics = {}
         size = math_round(size)
         cls.font = cls.get_font(size)
         cls.now_font_size = size
+        FontAttribute.generation += 1
 
     @classmethod
     def get_font(cls, size: float | int = None):
@@ -81,99 +246,188 @@ class FontAttribute(Attribute):
             return font
         font = add_font(file=cls.font_path, size=size, parent=font_registry)
         cls._fonts[size] = font
+        FontAttribute.font_files[font] = (cls.font_path, size)
         return font
 
     @classmethod
     def get_now_font_size(cls):
         return cls.now_font_size
 
+    @classmethod
+    def get_metrics(cls, size: float | int = None) -> FontMetrics:
+        """:return: metrics of `get_font(size)`"""
+        if size is not None:
+            size = math_round(size)
+        if cls._metrics is None:  # No font set, the default DPG font is measured
+            cls._metrics = {}
+        metrics = cls._metrics.get(size, None)
+        if metrics is None:
+            metrics = cls._metrics[size] = FontMetrics(cls.get_font(size), size if size is not None else cls.now_font_size)
+        return metrics
+
+
+class LinkIndex:
+    """
+    Rectangles of the links of one rendered text, bucketed by rows of `cell_height`
+    pixels, so a point is tested only against the links of its row.
+
+    Points are relative to the top left corner of `item` (the text group or the drawlist).
+
+    Items with links are bound to one item_handler_registry with a single hover handler,
+    which records the frame an item was last hovered in. Only the recently hovered items
+    are hit-tested, instead of asking DPG about every text with links on every mouse move.
+    """
+    cell_height = 32
+    _indexes: dict[int | str, 'LinkIndex'] = {}
+    _hovered: dict[int | str, int] = {}  # item: last frame DPG reported it hovered
+    _registry: int | str = None
+    _prune_size = 64  # Indexes are checked for deleted items when their number doubles
+
+    def __init__(self, item: int | str):
+        self.item = item
+        self.cells: dict[int, list[tuple[float, float, float, float, 'HoverAttribute']]] = {}
+        self.hover_bound = False
 
-class HoverAttribute(Attribute):
-    _mouse_move_handler = None
-    _hovered_items = {}
-    _handler: int = None
-
-    now_hover_item = None
+    @classmethod
+    def create(cls, item: int | str) -> 'LinkIndex':
+        if len(cls._indexes) >= cls._prune_size:
+            cls._prune()
+        index = cls._indexes[item] = cls(item)
+        return index
 
-    def __new__(cls, *args, **kwargs):
-        if cls._mouse_move_handler is None:
-            with dpg.handler_registry() as cls._mouse_move_handler:
-                dpg.add_mouse_move_handler(callback=lambda: cls._check_hovered_items())
-        return super().__new__(cls)
+    @classmethod
+    def remove(cls, item: int | str):
+        """Forgets the index of an item that is deleted"""
+        cls._indexes.pop(item, None)
+        cls._hovered.pop(item, None)
 
-    def __init__(self, attribute_connector: AttributeConnector | None):
-        if attribute_connector is None:
-            attribute_connector = AttributeConnector()
-        self.attribute_connector = attribute_connector
+    @classmethod
+    def _prune(cls):
+        for key in [key for key in cls._indexes if not dpg.does_item_exist(key)]:
+            cls.remove(key)
+        cls._prune_size = max(64, len(cls._indexes) * 2)
 
     @classmethod
-    def _check_hovered_items(cls):
-        for item in list(cls._hovered_items):
-            if not dpg.is_item_hovered(item):
-                callback = cls._hovered_items[item]
-                try:
-                    callback()
-                except Exception:
-                    traceback.print_exc()
-                del cls._hovered_items[item]
+    def get(cls, item: int | str) -> 'LinkIndex':
+        index = cls._indexes.get(item, None)
+        if index is None:
+            index = cls.create(item)
+        return index
+
+    def add(self, rect: tuple, attribute: 'HoverAttribute'):
+        """
+        :param rect: (x, y, width, height) of the link text
+        """
+        HoverAttribute.add_mouse_handler()
+        if not self.hover_bound:
+            self._bind_hover_handler()
+        x, y, width, height = rect
+        for row in range(int(y // self.cell_height), int((y + height) // self.cell_height) + 1):
+            self.cells.setdefault(row, []).append((x, y, x + width, y + height, attribute))
+
+    def find(self, x: float | int, y: float | int) -> 'HoverAttribute | None':
+        for x0, y0, x1, y1, attribute in self.cells.get(int(y // self.cell_height), ()):
+            if x0 <= x < x1 and y0 <= y < y1:
+                return attribute
+        return None
+
+    def _bind_hover_handler(self):
+        cls = type(self)
+        if cls._registry is None:
+            with dpg.item_handler_registry() as cls._registry:
+                dpg.add_item_hover_handler(callback=lambda s, item: cls._on_hovered(item))
+        dpg.bind_item_handler_registry(self.item, cls._registry)
+        self.hover_bound = True
 
     @classmethod
-    def add_to_check_hover_items(cls, item: int | str, callback=None):
-        cls._hovered_items[item] = callback
+    def _on_hovered(cls, item: int | str):
+        frame = dpg.get_frame_count()
+        entered = cls._hovered.get(item, -2) < frame - 1
+        cls._hovered[item] = frame
+        if entered:  # The mouse may not move again after entering the text
+            HoverAttribute._update_hovered()
 
-    def _create_handler(self):
-        if self.attribute_connector is not None:
-            if self.attribute_connector.handler is not None:
-                self._handler = self.attribute_connector.handler
-                return
+    @classmethod
+    def find_hovered(cls) -> 'HoverAttribute | None':
+        """:return: link under the mouse in any of the hovered texts"""
+        mouse_pos = None
+        frame = dpg.get_frame_count()
+        for item, hovered_frame in list(cls._hovered.items()):
+            index = cls._indexes.get(item, None)
+            if index is None or hovered_frame < frame - 2:
+                cls._hovered.pop(item, None)
+                continue
+            if not dpg.does_item_exist(item):
+                cls.remove(item)
+                continue
+            if not dpg.is_item_hovered(item):
+                continue
+            if mouse_pos is None:
+                mouse_pos = dpg.get_mouse_pos(local=False)
+            x, y = dpg.get_item_rect_min(item)
+            attribute = index.find(mouse_pos[0] - x, mouse_pos[1] - y)
+            if attribute is not None:
+                return attribute
+        return None
 
-        with dpg.item_handler_registry() as handler:
-            dpg.add_item_clicked_handler(callback=lambda s, info, u: self.click(info[0]))
-            dpg.add_item_hover_handler(callback=lambda s, item, u: self._hover(item))
-        self._handler = handler
 
-        if self.attribute_connector is not None:
-            self.attribute_connector.handler = self._handler
+class HoverAttribute(Attribute):
+    """
+    Attribute with hover and click callbacks. The rectangles of the rendered text are
+    added to the LinkIndex of the text, which is hit-tested on every mouse move and click.
+    """
+    _mouse_handler = None
+    hovered_attribute: 'HoverAttribute | None' = None
+
+    @staticmethod
+    def add_mouse_handler():
+        """Adds the mouse handlers that hit-test the links, once the first link is rendered"""
+        if HoverAttribute._mouse_handler is None:
+            with dpg.handler_registry() as HoverAttribute._mouse_handler:
+                dpg.add_mouse_move_handler(callback=lambda: HoverAttribute._update_hovered())
+                dpg.add_mouse_click_handler(callback=lambda s, mouse_button: HoverAttribute._click_hovered(mouse_button))
 
-    def add_item_to_handler(self, item):
-        if self._handler is None:
-            self._create_handler()
-        dpg.bind_item_handler_registry(item, self._handler)
+    def __init__(self, attribute_connector: AttributeConnector | None):
+        if attribute_connector is None:
+            attribute_connector = AttributeConnector()
+        self.attribute_connector = attribute_connector
 
-    def render(self, *args, **kwargs):
+    @staticmethod
+    def _update_hovered():
+        attribute = LinkIndex.find_hovered()
+        hovered_attribute = HoverAttribute.hovered_attribute
+        if attribute is hovered_attribute:
+            return
+        HoverAttribute.hovered_attribute = attribute
+        try:
+            if hovered_attribute is not None:
+                for connected_attribute in hovered_attribute.attribute_connector:
+                    connected_attribute.unhover()
+            if attribute is not None:
+                for connected_attribute in attribute.attribute_connector:
+                    connected_attribute.hover()
+        except Exception:
+            traceback.print_exc()
+
+    @staticmethod
+    def _click_hovered(mouse_button):
+        attribute = LinkIndex.find_hovered()
+        if attribute is not None:
+            attribute.click(mouse_button)
+
+    def render(self, rect: tuple, parent=0):
+        """
+        :param rect: (x, y, width, height) of the text in the text group
+        :param parent: attributes group of the text
+        """
         self.attribute_connector.append(self)
+        LinkIndex.get(DecorationLayer.get(parent).get_text_group()).add(rect, self)
 
     def hover(self):
         ...
 
-    def _hover(self, hovere_item):
-        if self.now_hover_item is not None:
-            if dpg.is_item_hovered(hovere_item):
-                self.now_hover_item = hovere_item
-            return
-        self.now_hover_item = hovere_item
-        self.add_to_check_hover_items(hovere_item, self._unhover)
-
-        if self.attribute_connector is None:
-            self.hover()
-        else:
-            for attribute in self.attribute_connector:
-                attribute.hover()
-
     def unhover(self):
         ...
 
-    def _unhover(self):
-        if dpg.is_item_hovered(self.now_hover_item):
-            self.add_to_check_hover_items(self.now_hover_item, self._unhover)
-            return
-        self.now_hover_item = None
-
-        if self.attribute_connector is None:
-            self.unhover()
-        else:
-            for attribute in self.attribute_connector:
-                attribute.unhover()
-
     def click(self, mouse_button):
         ...
@@ -0,0 +1,88 @@
+import dearpygui.dearpygui as dpg
+
+from .attribute_types import LinkIndex
+from .layout import DisplayList, TextRun, Rect, Line, Circle, Polyline
+from .text_entities import LineEntity
+
+
+class DrawlistText:
+    """
+    Draws the DisplayList of a wrapped LineEntity into one dpg.drawlist with draw_text,
+    draw_line and draw_quad. No text, group or spacer items are created, so ImGui has
+    no widgets to lay out every frame.
+
+    Links are added to the LinkIndex of the drawlist while drawing.
+    """
+
+    def __init__(self):
+        self.drawlist = None
+        self.links: LinkIndex | None = None
+        self.display_list: DisplayList | None = None
+
+    def add(self, parent=0) -> int | str:
+        self.drawlist = dpg.add_drawlist(width=1, height=1, parent=parent)
+        return self.drawlist
+
+    def draw(self, print_text: LineEntity | DisplayList, wrap: int | float = -1):
+        """
+        :param print_text: wrapped text, or its already computed DisplayList
+        :param wrap: width the text was wrapped to, used for the drawlist and separator width.
+        """
+        display_list = print_text
+        if not isinstance(display_list, DisplayList):
+            display_list = DisplayList.create(print_text, wrap)
+        self.display_list = display_list
+
+        links = {id(item.link): item.link for item in display_list
+                 if isinstance(item, (TextRun, Line)) and item.link is not None}
+        for link in links.values():  # A cached display list keeps the items of its previous drawing
+            link.reset()
+
+        dpg.delete_item(self.drawlist, children_only=True, slot=2)
+        self.links = LinkIndex.create(self.drawlist)
+        dpg.configure_item(self.drawlist, width=max(int(display_list.width) + 1, 1),
+                           height=max(int(display_list.height) + 1, 1))
+        for item in display_list:
+            match item:
+                case TextRun():
+                    self._draw_text(item)
+                case Line():
+                    self._draw_line(item)
+                case Rect():
+                    self._draw_rect(item)
+                case Circle():
+                    dpg.draw_circle([item.x, item.y], item.radius, color=item.color, thickness=item.thickness,
+                                    parent=self.drawlist, **self._fill(item))
+                case Polyline():
+                    dpg.draw_polyline(item.points, color=item.color, thickness=item.thickness, parent=self.drawlist)
+
+    @staticmethod
+    def _fill(item: Rect | Circle) -> dict:
+        return {} if item.fill is None else {'fill': item.fill}
+
+    def _draw_text(self, item: TextRun):
+        dpg_text = dpg.draw_text([item.x, item.y], item.text, color=item.color, size=item.size, parent=self.drawlist)
+        if item.font is not None:
+            dpg.bind_item_font(dpg_text, item.font)
+
+        url_attribute = item.link
+        if url_attribute is not None:
+            if url_attribute not in url_attribute.attribute_connector:
+                url_attribute.attribute_connector.append(url_attribute)
+            url_attribute.dpg_text_objects.append(dpg_text)
+            self.links.add((item.x, item.y, item.width, item.height), url_attribute)
+
+    def _draw_line(self, item: Line):
+        dpg_line = dpg.draw_line([item.x0, item.y0], [item.x1, item.y1], color=item.color, thickness=item.thickness,
+                                 parent=self.drawlist)
+        if item.link is not None:
+            item.link.line_color = item.color
+            item.link.underline_objects.append(dpg_line)
+
+    def _draw_rect(self, item: Rect):
+        if item.rounding != 0:
+            dpg.draw_rectangle([item.x0, item.y0], [item.x1, item.y1], color=item.color, thickness=item.thickness,
+                               rounding=item.rounding, parent=self.drawlist, **self._fill(item))
+            return
+        dpg.draw_quad([item.x0, item.y0], [item.x1, item.y0], [item.x1, item.y1], [item.x0, item.y1],
+                      color=item.color, thickness=item.thickness, parent=self.drawlist, **self._fill(item))
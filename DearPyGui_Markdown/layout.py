@@ -0,0 +1,296 @@
+from .font_attributes import Default
+from .line_atributes import Blockquote, List, Separator
+from .text_attributes import Underline, Strike, Code, Pre, Url
+from .text_entities import LineEntity, StrEntity
+from .text_size import get_text_width
+
+
+class DisplayItem:
+    """One primitive of a DisplayList. Coordinates are relative to the top left corner of the text"""
+    __slots__ = ()
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return False
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+
+class TextRun(DisplayItem):
+    """
+    :param size: font size to draw the text with
+    :param link: Url of the text, its rectangle is clickable
+    """
+    __slots__ = ('x', 'y', 'width', 'height', 'text', 'font', 'size', 'color', 'link')
+
+    def __init__(self, x, y, width, height, text: str, font: int | str | None, size: float | int,
+                 color=(255, 255, 255, 255), link: Url | None = None):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.text = text
+        self.font = font
+        self.size = size
+        self.color = color
+        self.link = link
+
+
+class Rect(DisplayItem):
+    """
+    :param fill: None to draw only the border
+    :param background: background of text (code, code blocks), drawn behind the text
+    """
+    __slots__ = ('x0', 'y0', 'x1', 'y1', 'color', 'fill', 'thickness', 'rounding', 'background')
+
+    def __init__(self, x0, y0, x1, y1, color=(255, 255, 255, 255), fill=None, thickness: float | int = 1,
+                 rounding: float | int = 0, background: bool = False):
+        self.x0 = x0
+        self.y0 = y0
+        self.x1 = x1
+        self.y1 = y1
+        self.color = color
+        self.fill = fill
+        self.thickness = thickness
+        self.rounding = rounding
+        self.background = background
+
+
+class Line(DisplayItem):
+    """:param link: Url the line underlines, it changes color with the link"""
+    __slots__ = ('x0', 'y0', 'x1', 'y1', 'color', 'thickness', 'link')
+
+    def __init__(self, x0, y0, x1, y1, color=(255, 255, 255, 255), thickness: float | int = 1,
+                 link: Url | None = None):
+        self.x0 = x0
+        self.y0 = y0
+        self.x1 = x1
+        self.y1 = y1
+        self.color = color
+        self.thickness = thickness
+        self.link = link
+
+
+class Circle(DisplayItem):
+    __slots__ = ('x', 'y', 'radius', 'color', 'fill', 'thickness')
+
+    def __init__(self, x, y, radius, color=(255, 255, 255, 255), fill=None, thickness: float | int = 1):
+        self.x = x
+        self.y = y
+        self.radius = radius
+        self.color = color
+        self.fill = fill
+        self.thickness = thickness
+
+
+class Polyline(DisplayItem):
+    __slots__ = ('points', 'color', 'thickness')
+
+    def __init__(self, points: list, color=(255, 255, 255, 255), thickness: float | int = 1):
+        self.points = points
+        self.color = color
+        self.thickness = thickness
+
+
+class DisplayLine(DisplayItem):
+    """
+    One line of a DisplayList, not drawn itself. For renderers that create items line by line.
+    :param runs: text runs of the line, the text itself
+    :param decorations: the other items that start on the line, in drawing order
+    :param separator: the line is a separator, its line is in the display list but not in `decorations`
+    """
+    __slots__ = ('y', 'height', 'separator', 'runs', 'decorations')
+
+    def __init__(self, y, height, separator: bool = False):
+        self.y = y
+        self.height = height
+        self.separator = separator
+        self.runs: list[TextRun] = []
+        self.decorations: list[DisplayItem] = []
+
+
+class DisplayList:
+    """
+    Layout of a wrapped LineEntity as a flat list of text runs, rectangles, lines and
+    list markers with absolute positions, in drawing order.
+
+    No DPG item is created or queried: text is measured with get_text_width, so with a
+    TextMeasurer.provider (e.g. ttf_metrics.TTFTextSize.use()) the layout runs without
+    a viewport. Renderers only draw the items: drawlist_backend.DrawlistText draws them
+    into one drawlist, widget_backend.WidgetText creates the text items line by line.
+    """
+    check_mark_color = (75, 255, 75, 255)
+    separator_color = (110, 110, 128, 128)
+
+    def __init__(self):
+        self.items: list[DisplayItem] = []
+        self.lines: list[DisplayLine] = []
+        self.width: float | int = 0
+        self.height: float | int = 0
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __repr__(self):
+        return f'<DisplayList {len(self.items)} items, {self.width}x{self.height}>'
+
+    @classmethod
+    def create(cls, print_text: LineEntity, wrap: int | float = -1) -> 'DisplayList':
+        """:param wrap: width the text was wrapped to, the display list is at least this wide"""
+        display_list = cls()
+        display_list._layout(print_text, wrap)
+        return display_list
+
+    def get_links(self) -> list[TextRun]:
+        return [item for item in self.items if isinstance(item, TextRun) and item.link is not None]
+
+    def _layout(self, print_text: LineEntity, wrap: int | float):
+        runs = []  # (line, x, y, width, height, text, attributes, last_in_line)
+        bars: dict = {}  # Blockquote connector: [line, x, y0, y1]
+        markers: list[tuple[DisplayLine, List, float | int]] = []  # (line, List, x)
+        width = 0
+
+        y = 0
+        for item in print_text:
+            attributes = item.get_all_attributes()
+            if Separator in attributes:
+                half_height = int(Default.get_metrics().height * 0.5)
+                self.lines.append(DisplayLine(y, half_height * 2 + 1, separator=True))
+                y += half_height * 2 + 1
+                continue
+
+            line_height = item.get_height()
+            line = DisplayLine(y, line_height)
+            self.lines.append(line)
+            x = 0
+            blockquote_attributes = LineEntity.remove_duplicates_by_depth(LineEntity.get_attributes_by_type(attributes, Blockquote))
+            for attribute in blockquote_attributes:
+                bar = bars.get(attribute.attribute_connector, None)
+                if bar is None or bar[3] != y:
+                    bar = bars[attribute.attribute_connector] = [line, x + attribute.get_width() / 2 - 1, y, y]
+                bar[3] = y + line_height
+                x += attribute.get_width()
+
+            list_attributes = LineEntity.remove_duplicates_by_depth(LineEntity.get_attributes_by_type(attributes, List))
+            for attribute in list_attributes:
+                first_line_objects = attribute.attribute_connector.first_line_objects
+                if first_line_objects is None or attribute in first_line_objects:
+                    markers.append((line, attribute, x))
+                x += attribute.get_width()
+
+            line_runs = [item] if isinstance(item, StrEntity) else item.items()
+            for i, run in enumerate(line_runs):
+                text = str(run)
+                run_width = get_text_width(text, font=run.attributes.get_font())
+                height = run.attributes.get_height()
+                offset = line_height - height
+                if offset <= 1:  # Like the widgets, a text at most a pixel lower is not moved down
+                    offset = 0
+                runs.append((line, x, y + offset, run_width, height, text, run.attributes, i == len(line_runs) - 1))
+                x += run_width
+
+            width = max(width, x)
+            y += line_height
+        self.width = max(width, wrap)
+        self.height = y
+
+        pre_blocks = {}  # Pre connector: [line, x0, y0, x1, y1]
+        for line, x, y, run_width, height, text, attributes, last_in_line in runs:
+            if Pre in attributes:
+                connector = attributes[attributes.index(Pre)].attribute_connector
+                block = pre_blocks.setdefault(connector, [line, x, y, x + run_width, y + height])
+                block[1], block[2] = min(block[1], x), min(block[2], y)
+                block[3], block[4] = max(block[3], x + run_width), max(block[4], y + height)
+
+        for line, x, y, run_width, height, text, attributes, last_in_line in runs:
+            if Code in attributes:
+                self._add(line, Rect(x, y, x + run_width, y + height, color=Code.border_color, fill=Code.color,
+                                     background=True))
+            if Pre in attributes:
+                x1 = x + run_width
+                if last_in_line:
+                    x1 = pre_blocks[attributes[attributes.index(Pre)].attribute_connector][3]
+                self._add(line, Rect(x, y, x1, y + height, color=Pre.color, fill=Pre.color, background=True))
+
+        for run in runs:
+            self._add_run(*run[:-1:])
+
+        for line, x0, y0, x1, y1 in pre_blocks.values():
+            self._add(line, Rect(x0, y0, x1, y1, color=Pre.border_color))
+        for line, x, y0, y1 in bars.values():
+            self._add(line, Line(x, y0, x, y1, color=Blockquote.color, thickness=Blockquote.line_width))
+        for line, attribute, x in markers:
+            self._add_marker(line, attribute, x)
+        for line in self.lines:
+            if line.separator:
+                y = line.y + line.height // 2
+                self.items.append(Line(0, y, max(self.width, 1), y, color=self.separator_color))
+
+    def _add(self, line: DisplayLine, item: DisplayItem):
+        self.items.append(item)
+        line.decorations.append(item)
+
+    def _add_run(self, line: DisplayLine, x, y, width, height, text: str, attributes):
+        if len(text) == 0 or Separator in attributes:
+            return
+        text_color = attributes.get_color()
+        url_attribute: Url | None = attributes[attributes.index(Url)] if Url in attributes else None  # noqa
+        run = TextRun(x, y, width, height, text, attributes.get_font(), attributes.font_size or height,
+                      color=text_color, link=url_attribute)
+        self.items.append(run)
+        line.runs.append(run)
+
+        thickness = height / 15
+        if Strike in attributes:
+            strike_y = y + height / 2 + thickness / 2 + height / 20
+            color = url_attribute.color if url_attribute is not None else text_color
+            self._add(line, Line(x, strike_y, x + width, strike_y, color=color, thickness=thickness))
+
+        underline_y = y + height - thickness + thickness / 5
+        if Underline in attributes or url_attribute is not None:
+            color = text_color
+            if url_attribute is not None:
+                color = url_attribute.color if Underline in attributes else url_attribute.line_color
+            self._add(line, Line(x, underline_y, x + width, underline_y, color=color, thickness=thickness,
+                                 link=url_attribute))
+
+    def _add_marker(self, line: DisplayLine, attribute: List, x):
+        metrics = Default.get_metrics()
+        font = metrics.font
+        text_height = metrics.height
+        y, line_height = line.y, line.height
+        marker_x = x + attribute.get_width() - attribute.get_task_width()
+        if attribute.ordered:
+            text = f'{str(attribute.index)[-4::]}.  '
+            text_width = get_text_width(text, font=font)
+            self._add(line, TextRun(marker_x - text_width, y + (line_height - text_height) / 2, text_width, text_height,
+                                    text, font, Default.get_now_font_size() or text_height))
+        else:
+            height = width = text_height / 2.5
+            thickness = height / 7
+            x0 = marker_x - get_text_width('0.  ', font=font)
+            y0 = y + (line_height - text_height) / 2 + (text_height - height) * 0.77
+            depth = attribute.depth - attribute.depth // 4 * 4
+            fill = (255, 255, 255, 255) if depth in (1, 3) else (0, 0, 0, 0)
+            if depth in (1, 2):
+                self._add(line, Circle(x0 + width / 2, y0 + height / 2, width / 2 - thickness / 2,
+                                       fill=fill, thickness=thickness))
+            else:
+                self._add(line, Rect(x0 + thickness, y0 + thickness, x0 + width - thickness, y0 + height - thickness,
+                                     fill=fill, thickness=thickness))
+
+        if attribute.task:
+            size = Default.get_now_font_size() or text_height
+            box_y = y + (line_height - size) / 2
+            self._add(line, Rect(marker_x, box_y, marker_x + size, box_y + size, rounding=4))
+            if attribute.task_done:
+                self._add(line, Polyline([[marker_x + size * 0.2, box_y + size * 0.5],
+                                          [marker_x + size * 0.42, box_y + size * 0.72],
+                                          [marker_x + size * 0.8, box_y + size * 0.28]],
+                                         color=self.check_mark_color, thickness=max(size / 8, 1)))
@@ -3,14 +3,21 @@ Source: https://github.com/LonamiWebs/Telethon/blob/v1/telethon/extensions/html.
 
 Simple HTML -> entity parser.
 """
+import bisect
+import copy
 import html
+import re
 import struct
+import sys
+import threading
 import traceback
-from collections import deque
+from collections import deque, OrderedDict
 from dataclasses import dataclass, field
 from html.parser import HTMLParser
+from urllib.parse import quote
 
 import mistletoe
+from mistletoe.base_renderer import URI_SAFE_CHARACTERS
 
 from .attribute_types import AttributeConnector
 
@@ -113,56 +120,67 @@ class MessageEntityH6(MessageEntity): ...
 def _strip_text(text, entities):
     """
     Strips whitespace from the given text modifying the provided entities.
-    This assumes that there are no overlapping entities, that their length
-    is greater or equal to one, and that their length is not out of bounds.
+    Entities that lie inside the stripped whitespace are removed and entities
+    that cross it are shortened, so no entity is left with a negative length.
+    Empty entities (like separators) are kept: the ones before the text are
+    moved to its start, the ones after it keep their distance from each other.
     """
     if not entities:
         return text.strip()
-    while text and text[-1].isspace():
-        e = entities[-1]
-        if e.offset + e.length == len(text):
-            if e.length == 1:
-                del entities[-1]
-                if not entities:
-                    return text.strip()
-            else:
-                e.length -= 1
-        text = text[:-1]
-
-    while text and text[0].isspace():
-        for i in reversed(range(len(entities))):
-            e = entities[i]
-            if e.offset != 0:
-                e.offset -= 1
-                continue
-
-            if e.length == 1:
-                del entities[0]
-                if not entities:
-                    return text.lstrip()
-            else:
-                e.length -= 1
-
-        text = text[1:]
-
-    return text
+
+    end = len(text.rstrip())
+    start = end - len(text[:end].lstrip())
+    kept_entities = []
+    for e in entities:
+        e_end = e.offset + max(e.length, 0)
+        if e.length > 0 and (e_end <= start or e.offset >= end):
+            continue
+        if e.offset >= end:  # Empty entity after the text, like a trailing separator
+            e.offset -= start
+            e.length = 0
+        else:
+            e.offset = max(e.offset, start) - start
+            e.length = max(min(e_end, end) - start - e.offset, 0)
+        kept_entities.append(e)
+    entities[:] = kept_entities
+    return text[start:end]
+
+
+_ASTRAL_CHARS = re.compile('[\U00010000-\U0010FFFF]')
+_SURROGATE_PAIRS = re.compile('[\ud800-\udbff][\udc00-\udfff]')
 
 
 def _add_surrogate(text):
-    return ''.join(
-        ''.join(chr(y) for y in struct.unpack('<HH', x.encode('utf-16le')))
-        if (0x10000 <= ord(x) <= 0x10FFFF) else x for x in text
-    )
+    if len(text.encode('utf-16-le', 'surrogatepass')) == 2 * len(text):
+        return text  # No astral characters
+    table = {}
+    for char in set(_ASTRAL_CHARS.findall(text)):
+        high, low = struct.unpack('<HH', char.encode('utf-16le'))
+        table[ord(char)] = chr(high) + chr(low)
+    return text.translate(table)
 
 
-def _del_surrogate(text):
-    return text.encode('utf-16', 'surrogatepass').decode('utf-16')
+def _del_surrogate(text, entities=()):
+    """
+    Joins surrogate pairs back and converts the offsets of the given entities
+    from UTF-16 code units to indices of the returned text.
+    """
+    joined_text = text.encode('utf-16', 'surrogatepass').decode('utf-16')
+    if len(joined_text) == len(text) or not entities:
+        return joined_text
+    pair_ends = [match.end() for match in _SURROGATE_PAIRS.finditer(text)]
+    for e in entities:
+        end = e.offset + e.length
+        e.offset -= bisect.bisect_right(pair_ends, e.offset)
+        e.length = end - bisect.bisect_right(pair_ends, end) - e.offset
+    return joined_text
 
 
 class _HTMLToParser(HTMLParser):
     def __init__(self):
         super().__init__()
-        self.text = ''
+        self._text_chunks = []
+        self._text_length = 0
         self.entities = []
         self._building_entities = {}
         self._open_tags = deque()
@@ -174,6 +192,12 @@ class _HTMLToParser(HTMLParser):
         self.opened_list_depth = []
         self.ordered_list_index_by_depth = {}
 
+    @property
+    def text(self) -> str:
+        if len(self._text_chunks) != 1:
+            self._text_chunks = [''.join(self._text_chunks)]
+        return self._text_chunks[0]
+
     def handle_starttag(self, tag, attrs):
         self._open_tags.appendleft(tag)
         self._open_tags_meta.appendleft(None)
@@ -294,7 +318,7 @@ class _HTMLToParser(HTMLParser):
                 EntityType = MessageEntityH6
         if EntityType is not None and tag not in self._building_entities:
             self._building_entities[tag] = EntityType(
-                offset=len(self.text),
+                offset=self._text_length,
                 # The length will be determined when closing the tag.
                 length=0,
                 **args)
@@ -307,10 +331,8 @@ class _HTMLToParser(HTMLParser):
                 text = url
 
         text = html.unescape(text)
-        for tag, entity in self._building_entities.items():
-            entity.length += len(text)
-
-        self.text += text
+        self._text_chunks.append(text)
+        self._text_length += len(text)
 
     def handle_endtag(self, tag):
         try:
@@ -334,6 +356,7 @@ class _HTMLToParser(HTMLParser):
         if not entity:
             return
 
+        entity.length = self._text_length - entity.offset
         self.entities.append(entity)
 
 
@@ -363,18 +386,408 @@ except ModuleNotFoundError:
         ...
 
 
+_render_lock = threading.RLock()  # mistletoe renderers change global token lists
+
+
+class _UnsupportedToken(Exception):
+    ...
+
+
+class _HTMLToRenderer(HTMLParser):
+    """
+    Forwards the tags and text of an HTML fragment to _EntityRenderer.
+    """
+
+    def __init__(self, renderer: '_EntityRenderer'):
+        super().__init__()
+        self.renderer = renderer
+
+    def handle_starttag(self, tag, attrs):
+        self.renderer._start_tag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        self.renderer._end_tag(tag)
+
+    def handle_data(self, data):
+        self.renderer._add_data(data)
+
+
+class _EntityRenderer(_PygmentsRenderer):
+    """
+    Feeds the mistletoe token tree straight into _HTMLToParser, without rendering
+    and re-tokenizing an HTML string.
+
+    The tags and text are emitted in the same order as the HTML renderer would write
+    them. The HTML fix-ups done in `_parse_html` are applied as newline rules around
+    the tags. Code blocks are rendered to HTML (highlighted if pygments is installed)
+    and forwarded tag by tag. For raw HTML, tables and e-mail links the same token
+    tree is rendered to HTML and parsed by `_parse_html` instead.
+    """
+    eat_next_newline_tags = {'<blockquote>', '<li>', '<ul>', '<ol>'}
+    eat_previous_newline_tags = {'</blockquote>', '</li>', '</ul>', '</ol>', '<ol start>', '</pre>'}
+
+    def __init__(self):
+        super().__init__()
+        self.parser = _HTMLToParser()
+        self._data = []
+        self._last_tag = None
+        self._pending_list_item = False
+
+    @classmethod
+    def parse(cls, markdown_text: str) -> _HTMLToParser:
+        with _render_lock, cls() as renderer:
+            document = mistletoe.Document(markdown_text)
+            try:
+                renderer.render(document)
+            except _UnsupportedToken:
+                return _parse_html(document)
+            return renderer.parser
+
+    def _flush(self, next_tag: str | None):
+        data = ''.join(self._data)
+        self._data.clear()
+        if self._last_tag in self.eat_next_newline_tags and data.startswith('\n'):
+            data = data[1::]
+
+        if self._pending_list_item:
+            self._pending_list_item = False
+            attrs = []
+            if data.startswith(('[x] ', '[X] ')):
+                attrs = [('task-done', None)]
+                data = data[4::]
+            elif data.startswith('[ ] '):
+                attrs = [('task', None)]
+                data = data[4::]
+            self.parser.handle_starttag('li', attrs)
+
+        if next_tag in self.eat_previous_newline_tags and data.endswith('\n'):
+            data = data[:-1:]
+        if data:
+            self.parser.handle_data(data)
+
+    def _start_tag(self, tag: str, attrs: list[tuple[str, str | None]] = ()):
+        key = f'<{tag}>' if len(attrs) == 0 else f'<{tag} {attrs[0][0]}>'
+        self._flush(key)
+        self._last_tag = key
+        if tag == 'li':  # Task items are known only after the text that follows the tag
+            self._pending_list_item = True
+            return
+        self.parser.handle_starttag(tag, attrs)
+
+    def _end_tag(self, tag: str):
+        key = f'</{tag}>'
+        self._flush(key)
+        self._last_tag = key
+        self.parser.handle_endtag(tag)
+
+    def _start_end_tag(self, tag: str, attrs: list[tuple[str, str | None]] = ()):
+        self._start_tag(tag, attrs)
+        self._end_tag(tag)
+
+    def _add_data(self, text: str):
+        """
+        :param text: text with surrogates already added
+        """
+        self._data.append(text)
+
+    def _render_joined(self, children):
+        for i, child in enumerate(children):
+            if i != 0:
+                self._add_data('\n')
+            self.render(child)
+
+    def _render_tag(self, tag: str, token, attrs: list[tuple[str, str | None]] = ()) -> str:
+        self._start_tag(tag, attrs)
+        self.render_inner(token)
+        self._end_tag(tag)
+        return ''
+
+    def render(self, token) -> str:
+        render_function = self.render_map.get(token.__class__.__name__, None)
+        if render_function is None:
+            raise _UnsupportedToken(token.__class__.__name__)
+        return render_function(token)
+
+    def render_inner(self, token) -> str:
+        for child in token.children:
+            self.render(child)
+        return ''
+
+    def render_unsupported(self, token) -> str:
+        raise _UnsupportedToken(token.__class__.__name__)
+
+    render_html_span = render_html_block = render_unsupported
+    render_table = render_table_row = render_table_cell = render_unsupported
+
+    def render_strong(self, token) -> str:
+        return self._render_tag('strong', token)
+
+    def render_emphasis(self, token) -> str:
+        return self._render_tag('em', token)
+
+    def render_strikethrough(self, token) -> str:
+        return self._render_tag('del', token)
+
+    def render_inline_code(self, token) -> str:
+        self._start_tag('code')
+        self._add_data(_add_surrogate(token.children[0].content))
+        self._end_tag('code')
+        return ''
+
+    def render_raw_text(self, token) -> str:
+        self._add_data(_add_surrogate(token.content))
+        return ''
+
+    def render_escape_sequence(self, token) -> str:
+        return self.render_inner(token)
+
+    def render_image(self, token) -> str:
+        self._start_end_tag('img')
+        return ''
+
+    def render_link(self, token) -> str:
+        attrs = [('href', quote(token.target, safe=URI_SAFE_CHARACTERS))]
+        if token.title:
+            attrs.append(('title', token.title))
+        return self._render_tag('a', token, attrs)
+
+    def render_auto_link(self, token) -> str:
+        if token.mailto:
+            raise _UnsupportedToken(token.__class__.__name__)
+        return self._render_tag('a', token, [('href', quote(token.target, safe=URI_SAFE_CHARACTERS))])
+
+    def render_line_break(self, token) -> str:
+        if not token.soft:
+            self._start_end_tag('br')
+        self._add_data('\n')
+        return ''
+
+    def render_thematic_break(self, token) -> str:
+        self._start_end_tag('hr')
+        return ''
+
+    def render_heading(self, token) -> str:
+        return self._render_tag(f'h{token.level}', token)
+
+    def render_paragraph(self, token) -> str:
+        if self._suppress_ptag_stack[-1]:
+            return self.render_inner(token)
+        return self._render_tag('p', token)
+
+    def render_quote(self, token) -> str:
+        self._start_tag('blockquote')
+        self._add_data('\n')
+        self._suppress_ptag_stack.append(False)
+        for child in token.children:
+            self.render(child)
+            self._add_data('\n')
+        self._suppress_ptag_stack.pop()
+        self._end_tag('blockquote')
+        return ''
+
+    def render_block_code(self, token) -> str:
+        html_parser = _HTMLToRenderer(self)
+        html_parser.feed(_add_surrogate(super().render_block_code(token)))
+        html_parser.close()
+        return ''
+
+    def render_list(self, token) -> str:
+        if token.start is not None:
+            tag = 'ol'
+            attrs = [('start', str(token.start))] if token.start != 1 else []
+        else:
+            tag = 'ul'
+            attrs = []
+        self._start_tag(tag, attrs)
+        self._add_data('\n')
+        self._suppress_ptag_stack.append(not token.loose)
+        self._render_joined(token.children)
+        self._suppress_ptag_stack.pop()
+        self._add_data('\n')
+        self._end_tag(tag)
+        return ''
+
+    def render_list_item(self, token) -> str:
+        self._start_tag('li')
+        if len(token.children) != 0:
+            suppress_ptag = self._suppress_ptag_stack[-1]
+            if not (suppress_ptag and token.children[0].__class__.__name__ == 'Paragraph'):
+                self._add_data('\n')
+            self._render_joined(token.children)
+            if not (suppress_ptag and token.children[-1].__class__.__name__ == 'Paragraph'):
+                self._add_data('\n')
+        self._end_tag('li')
+        return ''
+
+    def render_document(self, token) -> str:
+        self._render_joined(token.children)
+        if len(token.children) != 0:
+            self._add_data('\n')
+        self._flush(None)
+        return ''
+
+
+class ParseCache:
+    """
+    LRU cache of parse results keyed by the markdown source and the renderer.
+
+    Cached entities are never handed out directly: every hit returns fresh copies
+    without attribute connectors, because those are mutated while rendering.
+    """
+    max_entries = 256
+    max_bytes = 32 * 1024 * 1024
+
+    hits = 0
+    misses = 0
+    size_bytes = 0
+
+    _entries: OrderedDict[tuple, tuple[str, list[MessageEntity], int]] = OrderedDict()
+    _lock = threading.Lock()
+
+    @classmethod
+    def set_limits(cls, max_entries: int = None, max_bytes: int = None):
+        """
+        :param max_entries: maximum count of cached documents, 0 disables the cache
+        :param max_bytes: approximate maximum memory used by the cached documents
+        """
+        with cls._lock:
+            if max_entries is not None:
+                cls.max_entries = max_entries
+            if max_bytes is not None:
+                cls.max_bytes = max_bytes
+            cls._evict()
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries.clear()
+            cls.size_bytes = 0
+            cls.hits = 0
+            cls.misses = 0
+
+    @staticmethod
+    def _copy_entities(entities: list[MessageEntity]) -> list[MessageEntity]:
+        copied_entities = []
+        for entity in entities:
+            entity = copy.copy(entity)
+            entity._attribute_connector = None
+            if isinstance(entity, MessageEntityFont) and isinstance(entity.color, list):
+                entity.color = list(entity.color)  # Mutable, not shared with the cached entity
+            copied_entities.append(entity)
+        return copied_entities
+
+    @staticmethod
+    def _get_size(markdown_text: str, text: str, entities: list[MessageEntity]) -> int:
+        size = sys.getsizeof(markdown_text) + sys.getsizeof(text)
+        if entities:
+            size += len(entities) * (sys.getsizeof(entities[0]) + sys.getsizeof(entities[0].__dict__))
+        return size
+
+    @classmethod
+    def _evict(cls):
+        while len(cls._entries) > cls.max_entries or (cls._entries and cls.size_bytes > cls.max_bytes):
+            _, (_, _, size) = cls._entries.popitem(last=False)
+            cls.size_bytes -= size
+
+    @classmethod
+    def get(cls, key: tuple) -> tuple[str, list[MessageEntity]] | None:
+        with cls._lock:
+            cached = cls._entries.get(key, None)
+            if cached is None:
+                cls.misses += 1
+                return None
+            cls.hits += 1
+            cls._entries.move_to_end(key)
+        text, entities, _ = cached
+        return text, cls._copy_entities(entities)
+
+    @classmethod
+    def put(cls, key: tuple, text: str, entities: list[MessageEntity]):
+        if cls.max_entries <= 0:
+            return
+        size = cls._get_size(key[-1], text, entities)
+        if size > cls.max_bytes:
+            return
+        entities = cls._copy_entities(entities)
+        with cls._lock:
+            previous = cls._entries.pop(key, None)
+            if previous is not None:
+                cls.size_bytes -= previous[2]
+            cls._entries[key] = (text, entities, size)
+            cls.size_bytes += size
+            cls._evict()
+
+
 def parse(html_text: str) -> [str, list[MessageEntity]]:
     """
     Parses the given HTML message and returns its stripped representation
     plus a list of the MessageEntity's that were found.
+    Results are cached in ParseCache.
 
     :param html: the message with HTML to be parsed.
     :return: a tuple consisting of (clean message, [message entities]).
     """
     if not html_text:
         return html_text, []
+
+    key = (_PygmentsRenderer, html_text)
+    cached = ParseCache.get(key)
+    if cached is not None:
+        return cached
+
+    text, entities = _parse(html_text)
+    ParseCache.put(key, text, entities)
+    return text, entities
+
+
+def get_last_block_offset(markdown_text: str) -> int:
+    """
+    Returns the offset of the last top-level block of the Markdown text that appending
+    text can change. The blocks before it are finished.
+
+    Only complete lines without the trailing blank ones are parsed: a line that can still
+    grow (e.g. indentation streamed before the text of a nested list item) is not read as
+    a block of its own. A list or a blockquote right before the last block is not finished
+    either, the lines after it can still belong to it.
+    """
+    complete_text = markdown_text[:markdown_text.rfind('\n') + 1:].rstrip()
+    with _render_lock, _EntityRenderer():
+        document = mistletoe.Document(complete_text)
+    children = document.children
+    if len(children) == 0:
+        return 0
+    last = len(children) - 1
+    while last > 0 and isinstance(children[last - 1], (mistletoe.block_token.List, mistletoe.block_token.Quote)):
+        last -= 1
+    line_number = getattr(children[last], 'line_number', 1)
+    return sum(map(len, markdown_text.splitlines(keepends=True)[:line_number - 1:]))
+
+
+def get_link_definitions(markdown_text: str) -> str:
+    """
+    Returns the link reference definitions of the Markdown text ([label]: url "title")
+    as Markdown, so the references of another text can be resolved with them.
+    """
+    with _render_lock, _EntityRenderer():
+        document = mistletoe.Document(markdown_text)
+    definitions = []
+    for label, (url, title) in document.footnotes.items():
+        url = url.replace('<', '\\<').replace('>', '\\>')
+        title = title.replace('"', '\\"')
+        definitions.append(f'[{label}]: <{url}> "{title}"\n')
+    return ''.join(definitions)
+
+
+def _parse(markdown_text: str) -> [str, list[MessageEntity]]:
+    parser = _EntityRenderer.parse(markdown_text)
+    text = _strip_text(parser.text, parser.entities)
+    return _del_surrogate(text, parser.entities), parser.entities
+
+
+def _parse_html(document: mistletoe.Document) -> _HTMLToParser:
     # html_text = html.unescape(_MarkdownIt.render(html_text))
-    html_text = mistletoe.markdown(html_text, renderer=_PygmentsRenderer)
+    with _PygmentsRenderer() as renderer:
+        html_text = renderer.render(document)
 
     html_text = html_text.replace('<blockquote>\n', '<blockquote>').replace('\n</blockquote>', '</blockquote>')
     html_text = html_text.replace('<li>\n', '<li>').replace('\n</li>', '</li>')
@@ -395,5 +808,4 @@ def parse(html_text: str) -> [str, list[MessageEntity]]:
 
     parser = _HTMLToParser()
     parser.feed(_add_surrogate(html_text))
-    text = _strip_text(parser.text, parser.entities)
-    return _del_surrogate(text), parser.entities
+    return parser
@@ -1,4 +1,9 @@
-import copy
+import bisect
+import itertools
+import threading
+import time
+import weakref
+from array import array
 from typing import TypeVar
 
 import dearpygui.dearpygui as dpg  # noqa
@@ -6,38 +11,122 @@ import dearpygui.dearpygui as dpg  # noqa
 from .font_attributes import *
 from .line_atributes import *
 from .text_attributes import *
-
-
-class AttributeController(list[Attribute]):
+from . import CallInNextFrame
+from .attribute_types import AttributeConnector, DecorationLayer, LinkIndex
+from .text_size import get_text_width
+
+
+class AttributeController:
+    """
+    Immutable style of a text. Identical styles share one interned object.
+
+    The key is a bitmask of the flag attributes (classes like Bold or Code) plus the
+    ids of the parameterized ones (instances like Font, Url or List), so comparing and
+    hashing styles is cheap. Membership tests for attribute classes are set lookups, and
+    the font, color and line height are resolved once per font change.
+    """
+    __slots__ = ('attributes', 'instances', 'types', 'key', 'font', 'font_size', 'text_color', 'height', 'metrics',
+                 '_generation', '_sources', '__weakref__')
     dpg_group_theme: int = None
     text_color: list[int, int, int, int]
     font: None | int
+    font_size: None | int
+
+    _bits: dict[type, int] = {}  # Flag attribute: bit
+    _interned = weakref.WeakValueDictionary()  # (flags, ids of the instances): AttributeController
+    _interned_sources = weakref.WeakValueDictionary()  # Not normalized attributes: AttributeController
 
-    def __new__(cls, *args, **kwargs):
+    def __new__(cls, attributes: list[Attribute] = ()):
+        sources = tuple(attributes)
+        source_key = tuple(attribute if isinstance(attribute, type) else id(attribute) for attribute in sources)
+        self = cls._interned_sources.get(source_key, None)
+        if self is not None:
+            return self
+
+        attributes = cls._normalize(sources)
+        flags = 0
+        instances = []
+        for attribute in attributes:
+            if isinstance(attribute, type):
+                flags |= cls._get_bit(attribute)
+            else:
+                instances.append(attribute)
+        key = (flags, tuple(id(attribute) for attribute in instances))
+
+        self = cls._interned.get(key, None)
+        if self is None:
+            self = object.__new__(cls)
+            self.attributes = attributes
+            self.instances = tuple(instances)
+            self.types = frozenset(attribute if isinstance(attribute, type) else type(attribute) for attribute in attributes)
+            self.key = key
+            self._generation = None
+            self._sources = []
+            cls._interned[key] = self
+        self._sources.append(sources)  # Keeps the ids of the source key in use while it is interned
+        cls._interned_sources[source_key] = self
+        return self
+
+    @classmethod
+    def get_group_theme(cls) -> int:
+        """:return: theme without item spacing for the groups of the rendered text, created on first use"""
         if cls.dpg_group_theme is None:
             with dpg.theme() as cls.dpg_group_theme:
                 with dpg.theme_component(dpg.mvAll):
                     dpg.add_theme_style(dpg.mvStyleVar_ItemSpacing, 0, 0, category=dpg.mvThemeCat_Core)
-        return list.__new__(cls)
-
-    def __init__(self, attributes: list[Attribute]):
-        super().__init__()
-        self.clear()
+        return cls.dpg_group_theme
 
+    @staticmethod
+    def _normalize(attributes: tuple) -> tuple:
+        normalized = []
         for attribute in reversed(attributes):
-            if attribute in self:
+            if attribute in normalized:
                 continue
 
             if attribute in [Bold, Italic]:
-                if BoldItalic in self:
+                if BoldItalic in normalized:
                     continue
                 opposite_attribute = Italic if (attribute is Bold) else Bold
-                if opposite_attribute in self:
-                    self[self.index(opposite_attribute)] = BoldItalic  # noqa
+                if opposite_attribute in normalized:
+                    normalized[normalized.index(opposite_attribute)] = BoldItalic  # noqa
                     continue
-            self.append(attribute)
+            normalized.append(attribute)
+        return tuple(normalized)
 
-    def get_font(self) -> None | int:
+    @classmethod
+    def _get_bit(cls, attribute: type) -> int:
+        bit = cls._bits.get(attribute, None)
+        if bit is None:
+            bit = cls._bits[attribute] = 1 << len(cls._bits)
+        return bit
+
+    def __contains__(self, attribute) -> bool:
+        if isinstance(attribute, type):
+            return attribute in self.types
+        return attribute in self.attributes
+
+    def __iter__(self):
+        return iter(self.attributes)
+
+    def __len__(self) -> int:
+        return len(self.attributes)
+
+    def __getitem__(self, index):
+        return self.attributes[index]
+
+    def index(self, attribute) -> int:
+        return self.attributes.index(attribute)
+
+    def __eq__(self, other) -> bool:
+        return self is other or (isinstance(other, AttributeController) and self.key == other.key)
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __repr__(self):
+        return repr(list(self.attributes))
+
+    def _resolve(self):
         font_size = Default.get_now_font_size()
 
         used_heading_attribute = False
@@ -50,21 +139,21 @@ class AttributeController(list[Attribute]):
         if Font in self:
             _Font: Font = self[self.index(Font)]  # noqa
             font_size = _Font.size
+        self.font_size = math_round(font_size) if font_size is not None else None
 
         if Bold in self:
-            self.font = Bold.get_font(font_size)
+            self.metrics = Bold.get_metrics(font_size)
         elif Italic in self:
-            self.font = Italic.get_font(font_size)
+            self.metrics = Italic.get_metrics(font_size)
         elif BoldItalic in self:
-            self.font = BoldItalic.get_font(font_size)
+            self.metrics = BoldItalic.get_metrics(font_size)
         else:
             if used_heading_attribute:
-                self.font = Bold.get_font(font_size)
+                self.metrics = Bold.get_metrics(font_size)
             else:
-                self.font = Default.get_font(font_size)
-        return self.font
+                self.metrics = Default.get_metrics(font_size)
+        self.font = self.metrics.font
 
-    def get_color(self) -> list[int, int, int, int]:
         self.text_color = [255, 255, 255, 255]
         if Font in self:
             _Font: Font = self[self.index(Font)]  # noqa
@@ -73,71 +162,24 @@ class AttributeController(list[Attribute]):
         if Url in self:
             _Url: Url = self[self.index(Url)]  # noqa
             self.text_color = _Url.color
-        return self.text_color
-
-    def get_height(self) -> float | int:
-        return get_text_size('Tg,y', font=self.get_font())[1]
-
-    def render(self, text: str, parent=0, attributes_group=0, max_text_height: int | float = -1):
-        if Separator in self:
-            return
 
-        self.get_font()
-        self.get_color()
-
-        parent_text_group = parent
-        if max_text_height > 0:
-            spacer_height = max_text_height - get_text_size(text, font=self.font)[1]
-            if spacer_height > 1:
-                with dpg.group(parent=parent) as parent_text_group:
-                    dpg.add_spacer(height=spacer_height, parent=parent_text_group)
-                dpg.bind_item_theme(parent_text_group, self.dpg_group_theme)
-
-        with dpg.group(parent=parent_text_group) as dpg_text_group:
-            dpg_text = dpg.add_text(text, parent=dpg_text_group, color=self.text_color)
-            dpg.bind_item_font(dpg_text, self.font)
-        dpg.bind_item_theme(dpg_text_group, self.dpg_group_theme)
-
-        self.render_attributes(dpg_text, dpg_text_group, self.font, attributes_group)
-
-    @CallInNextFrame
-    def render_attributes(self, dpg_text, dpg_text_group, font=None, attributes_group=0):
-        strike_drawlist, strike_line = None, None
-        if Strike in self:
-            strike_drawlist, strike_line = Strike.render(dpg_text, dpg_text_group,
-                                                         font=font,
-                                                         parent=attributes_group,
-                                                         color=self.text_color)
-
-        underline_drawlist, underline_line = None, None
-        if Underline in self:
-            underline_drawlist, underline_line = Underline.render(dpg_text, dpg_text_group,
-                                                                  font=font,
-                                                                  parent=attributes_group,
-                                                                  color=self.text_color)
+        self.height = self.metrics.height
+        self._generation = FontAttribute.generation
 
-        if Url in self:
-            url_attribute: Url = self[self.index(Url)]  # noqa
-            if strike_drawlist:  # Strike in self
-                url_attribute.add_item_to_handler(strike_drawlist)
-                url_attribute._objects.append(strike_line)
-                dpg.configure_item(strike_line, color=url_attribute.color)
-
-            if underline_drawlist:  # Underline in self
-                url_attribute.line_color = url_attribute.color
-            else:
-                underline_drawlist, underline_line = Underline.render(dpg_text, dpg_text_group, font=font, parent=attributes_group)
-
-            url_attribute.underline_objects.append(underline_line)
-            dpg.configure_item(underline_line, color=url_attribute.line_color)
+    def get_font(self) -> None | int:
+        if self._generation != FontAttribute.generation:
+            self._resolve()
+        return self.font
 
-            url_attribute.render(dpg_text, font=font, parent=attributes_group)
+    def get_color(self) -> list[int, int, int, int]:
+        if self._generation != FontAttribute.generation:
+            self._resolve()
+        return self.text_color
 
-        if Code in self:
-            Code.render(dpg_text_group)
-        if Pre in self:
-            pre_attribute: Pre = self[self.index(Pre)]  # noqa
-            pre_attribute.render(dpg_text_group)
+    def get_height(self) -> float | int:
+        if self._generation != FontAttribute.generation:
+            self._resolve()
+        return self.height
 
 
 SelfStrEntity = TypeVar("SelfStrEntity", bound="StrEntity")
@@ -187,7 +229,7 @@ class StrEntity(str):
     def get_width(self) -> float | int:
         font = self.attributes.get_font()
         text = str(self)
-        return get_text_size(text, font=font)[0]
+        return get_text_width(text, font=font)
 
     def get_height(self) -> float | int:
         return self.attributes.get_height()
@@ -196,15 +238,12 @@ class StrEntity(str):
         return [*self.attributes]
 
     def recreate_attributes(self):
-        list_of_attributes = self.attributes.copy()
-        del self.attributes
-        self.attributes = AttributeController([])
-        for i, attribute in enumerate(list_of_attributes):
-            if not isinstance(attribute, type):
-                attribute_connector = attribute.attribute_connector
-                attribute = copy.deepcopy(attribute)
-                attribute.attribute_connector = attribute_connector
-            self.attributes.append(attribute)
+        """Gives the entity its own copies of the parameterized attributes, which keep the state of one rendered line"""
+        if len(self.attributes.instances) == 0:
+            return
+        # Normalizing reverses the attributes, so the already normalized ones are passed reversed to keep their order
+        self.attributes = AttributeController([attribute if isinstance(attribute, type) else attribute.copy()
+                                               for attribute in reversed(self.attributes)])
 
     def items(self) -> list[SelfStrEntity]:
         items = [*self]
@@ -223,27 +262,23 @@ class StrEntity(str):
             _list[i].attributes = self.attributes
         return _list
 
-    def render(self, parent=0, attributes_group=0, max_text_height: int | float = -1):
-        self.attributes.render(text=str(self),
-                               parent=parent,
-                               attributes_group=attributes_group,
-                               max_text_height=max_text_height)
-
 
 class TextEntity(list[StrEntity | SelfTextEntity]):
-    def split(self, sep: str | None = None) -> list[StrEntity | list[SelfStrEntity]]:
+    def split(self, sep: str | None = None) -> list[StrEntity | SelfTextEntity]:
         _list = []
-        for StrEntity in self:
-            parts = StrEntity.split(sep)
+        builder = None
+        for item in self:
+            parts = str.split(item, sep)
             if len(parts) == 0:
                 continue
-
-            if len(_list) == 0:
-                _list.extend(parts)
-            else:
-                _list[-1] = _list[-1] + parts[0]
-                _list.extend(parts[1::])
-
+            if builder is None:
+                builder = LineBuilder()
+            builder.append(parts[0], item.attributes)
+            for part in parts[1::]:
+                _list.append(builder.freeze())
+                builder = LineBuilder().append(part, item.attributes)
+        if builder is not None:
+            _list.append(builder.freeze())
         return _list
 
     def __add__(_self, __object: StrEntity | SelfTextEntity) -> SelfTextEntity:
@@ -315,17 +350,203 @@ class TextEntity(list[StrEntity | SelfTextEntity]):
             all_chars.extend(item.chars())
         return all_chars
 
-    def render(self, parent=0, attributes_group=0, max_text_height: int | float = -1):
-        with dpg.group(horizontal=True, parent=parent) as group:
-            for item in self:
-                item.render(parent=group,
-                            attributes_group=attributes_group,
-                            max_text_height=max_text_height)
-        dpg.bind_item_theme(group, AttributeController.dpg_group_theme)
+
+class LineBuilder:
+    """
+    Mutable line that runs are appended to in place.
+
+    A run of the same style as the last one is merged into it by appending its text to
+    a list, so building a line of n runs takes O(n) instead of copying the whole line on
+    every `+`. Empty runs are dropped, but an all empty line keeps the style of its first
+    run, like `StrEntity.__add__`. `freeze` joins the texts once, when the line is finished,
+    and reuses the appended StrEntity of a run that was not merged.
+    """
+
+    def __init__(self):
+        self.texts: list[list[str]] = []
+        self.styles: list[AttributeController] = []
+        self.entities: list[StrEntity | None] = []
+        self.first_style: AttributeController | None = None
+
+    def __len__(self):
+        return len(self.styles)
+
+    def append(self, text: str, attributes: AttributeController, entity: StrEntity | None = None) -> 'LineBuilder':
+        """
+        :param entity: StrEntity of the text, reused if the run is not merged with another one
+        """
+        if self.first_style is None:
+            self.first_style = attributes
+        if len(text) == 0:
+            return self
+        if len(self.styles) != 0 and self.styles[-1] == attributes:
+            self.texts[-1].append(text)
+            self.entities[-1] = None
+        else:
+            self.texts.append([text])
+            self.styles.append(attributes)
+            self.entities.append(entity)
+        return self
+
+    def append_entity(self, entity: StrEntity | TextEntity) -> 'LineBuilder':
+        if isinstance(entity, StrEntity):
+            return self.append(str(entity), entity.attributes, entity)
+        for item in entity:
+            self.append_entity(item)
+        return self
+
+    def freeze(self) -> StrEntity | TextEntity:
+        """:return: StrEntity for a line of one style, TextEntity of its runs otherwise"""
+        entities = []
+        for texts, attributes, str_entity in zip(self.texts, self.styles, self.entities):
+            if str_entity is None:
+                str_entity = StrEntity(''.join(texts))
+                str_entity.attributes = attributes
+            entities.append(str_entity)
+        if len(entities) == 0:
+            str_entity = StrEntity('')
+            if self.first_style is not None:
+                str_entity.attributes = self.first_style
+            return str_entity
+        if len(entities) == 1:
+            return entities[0]
+        return TextEntity(entities)
+
+
+class SpanText:
+    """
+    Document model: one backing string and a table of spans.
+
+    Every span is (start, end, style id) over the backing string, where the style id is
+    an index into `styles`, the interned AttributeController of the span. Paragraphs,
+    words and lines are (start, end) ranges over the string, and only the wrapped lines
+    are turned into StrEntity runs for rendering.
+    """
+
+    def __init__(self):
+        self.starts = array('l')
+        self.ends = array('l')
+        self.style_ids = array('l')
+        self.styles: list[AttributeController] = []
+        self._style_ids: dict[AttributeController, int] = {}
+        self._parts: list[str] = []
+        self._text: str | None = ''
+        self.length = 0
+
+    @classmethod
+    def from_entity(cls, entity: StrEntity | TextEntity) -> 'SpanText':
+        span_text = cls()
+        span_text.append_entity(entity)
+        return span_text
+
+    def append(self, text: str, attributes: list[Attribute] | AttributeController = ()):
+        if len(text) == 0:
+            return
+        if not isinstance(attributes, AttributeController):
+            attributes = AttributeController(attributes)
+        style_id = self._style_ids.get(attributes, None)
+        if style_id is None:
+            style_id = self._style_ids[attributes] = len(self.styles)
+            self.styles.append(attributes)
+
+        self.starts.append(self.length)
+        self.length += len(text)
+        self.ends.append(self.length)
+        self.style_ids.append(style_id)
+        self._parts.append(text)
+        self._text = None
+
+    def append_entity(self, entity: StrEntity | TextEntity):
+        if isinstance(entity, StrEntity):
+            self.append(str(entity), entity.attributes)
+            return
+        for item in entity:
+            self.append_entity(item)
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = ''.join(self._parts)
+            self._parts = [self._text]
+        return self._text
+
+    def __str__(self):
+        return self.text
+
+    def __len__(self):
+        return self.length
+
+    def __repr__(self):
+        return f'<ST{[(self.text[start:end], self.styles[style_id]) for start, end, style_id in zip(self.starts, self.ends, self.style_ids)]}>'
+
+    def get_all_attributes(self) -> list[Attribute]:
+        return [attribute for style in self.styles for attribute in style]
+
+    def get_style(self, index: int) -> AttributeController:
+        """:return: style of the character at `index`"""
+        span = bisect.bisect_right(self.ends, max(index, 0))
+        if span == len(self.ends):
+            return AttributeController([]) if len(self.styles) == 0 else self.styles[self.style_ids[-1]]
+        return self.styles[self.style_ids[span]]
+
+    def get_runs(self, start: int, end: int) -> list[tuple[int, int, AttributeController]]:
+        """:return: (start, end, style) of the spans inside the range, neighbours of the same style merged"""
+        runs = []
+        span = bisect.bisect_right(self.ends, start)
+        while span < len(self.ends) and self.starts[span] < end:
+            style = self.styles[self.style_ids[span]]
+            run_start, run_end = max(self.starts[span], start), min(self.ends[span], end)
+            if len(runs) != 0 and runs[-1][2] is style:
+                runs[-1] = (runs[-1][0], run_end, style)
+            else:
+                runs.append((run_start, run_end, style))
+            span += 1
+        return runs
+
+    def paragraphs(self) -> list[tuple[int, int]]:
+        """:return: (start, end) of the lines separated by a new line character"""
+        text = self.text
+        paragraphs = []
+        start = 0
+        new_line = text.find('\n')
+        while new_line != -1:
+            paragraphs.append((start, new_line))
+            start = new_line + 1
+            new_line = text.find('\n', start)
+        paragraphs.append((start, len(text)))
+        return paragraphs
+
+    def to_entity(self, start: int = 0, end: int | None = None) -> StrEntity | TextEntity:
+        """
+        :return: StrEntity runs of the range. An empty range keeps the style of the
+            paragraph it is in, e.g. the blockquote of an empty quoted line.
+        """
+        if end is None:
+            end = self.length
+        builder = LineBuilder().append('', self.get_style(start - 1))
+        for run_start, run_end, style in self.get_runs(start, end):
+            builder.append(self.text[run_start:run_end], style)
+        return builder.freeze()
 
 
 class LineEntity(TextEntity):
-    post_render_queue: list
+    """
+    Wrapped lines of a text.
+
+    `frame_budget` (seconds of rendering per frame shared by all texts, e.g. 0.004)
+    renders long texts in slices over several frames, so the top of the text is shown
+    first. It is off (None) by default: with it, item sizes read right after the text is
+    added belong to a partly rendered text.
+
+    The appended lines get their own attribute connectors, so the render state of these
+    lines (links, list markers) is not shared with other wrappings of the same text.
+    """
+    frame_budget: float | None = None
+    connectors: dict[AttributeConnector, AttributeConnector] = None  # Connector of the text: connector of the lines
+    _budget_frame: int = -1
+    _budget_used: float = 0
+    _budget_lock = threading.Lock()  # Slices are rendered from the render thread and from frame callbacks
+    _rendering: dict = {}  # Parent: LineEntity that is rendered into it
 
     def __repr__(self):
         return f'<LE{list([*self])}>'
@@ -341,6 +562,16 @@ class LineEntity(TextEntity):
         __object.recreate_attributes()
         super().append(__object)
         attributes = __object.get_all_attributes()
+        if self.connectors is None:
+            self.connectors = {}
+        for attribute in attributes:
+            if isinstance(attribute, type) or attribute.attribute_connector is None:
+                continue
+            connector = self.connectors.get(attribute.attribute_connector, None)
+            if connector is None:
+                connector = self.connectors[attribute.attribute_connector] = AttributeConnector()
+                connector.first_line_objects = None
+            attribute.attribute_connector = connector
         list_attributes: list[List] = self.get_attributes_by_type(attributes, List)  # noqa
         if len(list_attributes) > 0:
             sorted_by_attribute_connector = {}
@@ -367,8 +598,17 @@ class LineEntity(TextEntity):
 
     @staticmethod
     def get_width(text_entity: TextEntity | StrEntity) -> float | int:  # noqa
-        width = text_entity.get_width()
-        attributes = text_entity.get_all_attributes()
+        attributes_width = LineEntity.get_attributes_width(text_entity.get_all_attributes())
+        if attributes_width is None:
+            return -1
+        return text_entity.get_width() + attributes_width
+
+    @staticmethod
+    def get_attributes_width(attributes: list[Attribute]) -> float | int | None:
+        """
+        :return: width taken by the line attributes (blockquotes, lists) or None if the line is a separator
+        """
+        width = 0
 
         blockquote_attributes: list[Blockquote] = LineEntity.get_attributes_by_type(attributes, Blockquote)  # noqa
         blockquote_attributes: list[Blockquote] = LineEntity.remove_duplicates_by_depth(blockquote_attributes)  # noqa
@@ -381,42 +621,229 @@ class LineEntity(TextEntity):
             width += attribute.get_width()
         separator_attributes: list[Separator] = LineEntity.get_attributes_by_type(attributes, Separator)  # noqa
         if len(separator_attributes) > 0:
-            width = -1
+            return None
 
         return width
 
-    def render(self, parent=0, attributes_group=0):  # noqa
-        self.post_render_queue = list()
-        for item in self:
-            with dpg.group(horizontal=True, parent=parent) as group:
-                self.render_attributes(item, parent=group, attributes_group=attributes_group)
-                item.render(parent=group,
-                            attributes_group=attributes_group,
-                            max_text_height=item.get_height())
-
-            dpg.bind_item_theme(group, AttributeController.dpg_group_theme)
-
-        for attribute in self.post_render_queue:
-            attribute.post_render(attributes_group=attributes_group)
-        del self.post_render_queue
-
-    def render_attributes(self, text_entity: TextEntity, parent=0, attributes_group=0):
-        attributes = text_entity.get_all_attributes()
-        text_height = text_entity.get_height()
-        blockquote_attributes: list[Blockquote] = self.get_attributes_by_type(attributes, Blockquote)  # noqa
-        blockquote_attributes: list[Blockquote] = self.remove_duplicates_by_depth(blockquote_attributes)  # noqa
-        for attribute in blockquote_attributes:
-            attribute.render(text_height, parent=parent, attributes_group=attributes_group)
+    @staticmethod
+    def get_line_height(text_entity: TextEntity | StrEntity) -> float | int:
+        """Height of the rendered line, a separator line is higher than its text"""
+        if Separator in text_entity.get_all_attributes():
+            return int(Default.get_metrics().height * 0.5) * 2 + 1
+        return text_entity.get_height()
+
+    def render(self, parent=0, attributes_group=0, origin: list | tuple | None = None):  # noqa
+        """
+        Lays the lines out into a DisplayList and renders it with widget_backend.WidgetText,
+        so the attributes are drawn in the same frame as the text.
+        :param origin: position of `parent` in window coordinates, if it is known before it is drawn
+        """
+        from .widget_backend import WidgetText  # widget_backend imports this module
+
+        widget_text = WidgetText(self, parent=parent, attributes_group=attributes_group, origin=origin)
+        LineEntity._rendering[parent] = self
+        self._render_lines(widget_text, 0)
+
+    def _render_lines(self, widget_text, start: int):
+        """
+        Renders the lines from `start` until the frame budget (if any) is used up
+        and continues in the next frame, so the top of the text is shown first.
+        """
+        parent = widget_text.parent
+        if LineEntity._rendering.get(parent, None) is not self:
+            return  # Rendered again by a reflow
+        if not dpg.does_item_exist(parent):
+            del LineEntity._rendering[parent]
+            return
 
-        list_attributes: list[List] = self.get_attributes_by_type(attributes, List)  # noqa
-        list_attributes: list[List] = self.remove_duplicates_by_depth(list_attributes)  # noqa
-        for attribute in list_attributes:
-            attribute.render(text_height, parent=parent, attributes_group=attributes_group)
-            self.post_render_queue.append(attribute)
+        frame = dpg.get_frame_count()
+        with LineEntity._budget_lock:
+            if frame != LineEntity._budget_frame:
+                LineEntity._budget_frame = frame
+                LineEntity._budget_used = 0
+            budget_used = LineEntity._budget_used
+        started = time.perf_counter()
+
+        lines = widget_text.display_list.lines
+        i = start
+        while i < len(lines):
+            if self.frame_budget is not None and budget_used + time.perf_counter() - started >= self.frame_budget:
+                break
+            widget_text.render_line(lines[i])
+            i += 1
+        with LineEntity._budget_lock:
+            if LineEntity._budget_frame == frame:
+                LineEntity._budget_used += time.perf_counter() - started
+
+        if i < len(lines):
+            CallInNextFrame.append(self._render_lines, widget_text, i)
+            return
+        del LineEntity._rendering[parent]
 
-        pre_attributes: list[Pre] = self.get_attributes_by_type(attributes, Pre)  # noqa
-        for attribute in pre_attributes:
-            self.post_render_queue.append(attribute)
 
-        if Separator in attributes:
-            Separator.render(parent=parent, attributes_group=attributes_group)
+class VirtualLineEntity(LineEntity):
+    """
+    LineEntity that creates DPG items only for the lines inside the scroll window
+    of its parent, plus a margin above and below.
+
+    Lines are rendered in pages. Pages that scroll away are deleted and the lines
+    above and below the rendered pages are replaced by two spacers, so the number
+    of live items depends on the window height, not on the document length.
+    """
+    page_lines = 32
+    max_page_lines = 128  # A page is cut here even inside a block (e.g. a long code block)
+    margin = 1.0  # Rendered area above and below the window, in window heights
+    scroll_containers = ('mvAppItemType::mvChildWindow', 'mvAppItemType::mvWindowAppItem')
+
+    group: int | str = None
+    handler: int | str = None
+    rendered_pages: dict[int, tuple[int | str, int | str]] = None
+
+    def render(self, parent=0, attributes_group=0):  # noqa
+        self.attributes_group = attributes_group
+        self.scroll_window = None
+        self._split_pages()
+        self.rendered_pages = {}
+
+        with dpg.group(parent=parent) as self.group:
+            self.top_spacer = dpg.add_spacer(height=0)
+            self.bottom_spacer = dpg.add_spacer(height=int(sum(self.page_heights)))
+        dpg.bind_item_theme(self.group, AttributeController.get_group_theme())
+
+        with dpg.item_handler_registry() as self.handler:
+            dpg.add_item_visible_handler(callback=lambda: self.update())
+        dpg.bind_item_handler_registry(self.group, self.handler)
+
+    def delete(self):
+        if self.handler is not None and dpg.does_item_exist(self.handler):
+            dpg.delete_item(self.handler)
+        if self.group is not None and dpg.does_item_exist(self.group):
+            dpg.delete_item(self.group)
+        if self.rendered_pages is not None:
+            for page_group, page_attributes_group in self.rendered_pages.values():
+                LinkIndex.remove(page_group)
+                DecorationLayer.remove(page_attributes_group)
+                if dpg.does_item_exist(page_attributes_group):
+                    dpg.delete_item(page_attributes_group)
+
+    @staticmethod
+    def _get_connectors(item: TextEntity | StrEntity) -> set[AttributeConnector]:
+        return {attribute.attribute_connector for attribute in item.get_all_attributes()
+                if not isinstance(attribute, type) and attribute.attribute_connector is not None}
+
+    def _split_pages(self):
+        """
+        Splits the lines into pages, preferably between lines that share no attribute
+        (blockquote, list, code block, link), and gives every page its own attribute
+        connectors, so a page can be deleted and rendered again on its own.
+        """
+        self.pages: list[tuple[int, int]] = []
+        self.page_heights: list[float | int] = []
+        self.page_connectors: list[dict[AttributeConnector, list | None]] = []  # Connector -> first_line_objects
+
+        start = 0
+        previous_connectors = set()
+        for i, item in enumerate(self):
+            connectors = self._get_connectors(item)
+            length = i - start
+            if length >= self.max_page_lines or (length >= self.page_lines and connectors.isdisjoint(previous_connectors)):
+                self.pages.append((start, i))
+                start = i
+            previous_connectors = connectors
+        if start < len(self):
+            self.pages.append((start, len(self)))
+
+        for start, end in self.pages:
+            page_connectors = {}
+            for item in self[start:end:]:
+                for attribute in item.get_all_attributes():
+                    if isinstance(attribute, type) or attribute.attribute_connector is None:
+                        continue
+                    connector = attribute.attribute_connector
+                    page_connector = page_connectors.get(connector, None)
+                    if page_connector is None:
+                        page_connector = page_connectors[connector] = AttributeConnector()
+                    attribute.attribute_connector = page_connector
+            self.page_connectors.append({page_connector: getattr(connector, 'first_line_objects', None)
+                                         for connector, page_connector in page_connectors.items()})
+            self.page_heights.append(sum(self.get_line_height(item) for item in self[start:end:]))
+
+    def _get_scroll_window(self) -> int | str:
+        if self.scroll_window is None:
+            parent = self.group
+            while True:
+                parent = dpg.get_item_parent(parent)
+                if parent is None or dpg.get_item_info(parent)['type'] in self.scroll_containers:
+                    break
+            self.scroll_window = parent
+        return self.scroll_window
+
+    def _render_page(self, index: int, before: int | str, origin: list | tuple | None = None):
+        start, end = self.pages[index]
+        page_group = dpg.add_group(before=before)
+        dpg.bind_item_theme(page_group, AttributeController.get_group_theme())
+        page_attributes_group = dpg.add_group(parent=self.attributes_group)
+
+        page = LineEntity(self[start:end:])
+        page.frame_budget = None  # Pages are small and their heights are measured in the next frame
+        for attribute in page.get_all_attributes():
+            if not isinstance(attribute, type):
+                attribute.reset()
+        for connector, first_line_objects in self.page_connectors[index].items():
+            connector.first_line_objects = first_line_objects
+        page.render(parent=page_group, attributes_group=page_attributes_group, origin=origin)
+        self.rendered_pages[index] = (page_group, page_attributes_group)
+
+    def _delete_page(self, index: int):
+        page_group, page_attributes_group = self.rendered_pages.pop(index)
+        LinkIndex.remove(page_group)
+        DecorationLayer.remove(page_attributes_group)
+        dpg.delete_item(page_group)
+        dpg.delete_item(page_attributes_group)
+
+    def update(self):
+        """
+        Renders the pages that are inside the scroll window and deletes the others.
+        Called every frame while the text is visible.
+        """
+        if not dpg.does_item_exist(self.group):
+            return
+        window = self._get_scroll_window()
+        if window is None:
+            return
+
+        for index, (page_group, _) in self.rendered_pages.items():
+            height = dpg.get_item_rect_size(page_group)[1]
+            if height > 0:
+                self.page_heights[index] = height
+
+        window_height = dpg.get_item_rect_size(window)[1] or dpg.get_item_height(window)
+        group_x, group_y = dpg.get_item_pos(self.group)
+        view_y = dpg.get_y_scroll(window) - group_y
+        view_start = view_y - window_height * self.margin
+        view_end = view_y + window_height * (1 + self.margin)
+
+        page_ends = list(itertools.accumulate(self.page_heights))
+        first = bisect.bisect_right(page_ends, view_start)
+        last = bisect.bisect_left(page_ends, view_end)
+        last = min(last, len(self.pages) - 1)
+
+        for index in list(self.rendered_pages):
+            if not first <= index <= last:
+                self._delete_page(index)
+
+        # Pages are stacked under the top spacer, so their positions are known before they are drawn
+        top_height = int(page_ends[first - 1]) if first > 0 else 0
+        page_y = group_y + top_height + sum(self.page_heights[first:last + 1:])
+        before = self.bottom_spacer
+        for index in reversed(range(first, last + 1)):
+            page_y -= self.page_heights[index]
+            if index not in self.rendered_pages:
+                self._render_page(index, before, origin=(group_x, page_y))
+            before = self.rendered_pages[index][0]
+
+        bottom_height = int(page_ends[-1] - page_ends[last]) if last >= 0 else 0
+        if dpg.get_item_height(self.top_spacer) != top_height:
+            dpg.configure_item(self.top_spacer, height=top_height)
+        if dpg.get_item_height(self.bottom_spacer) != bottom_height:
+            dpg.configure_item(self.bottom_spacer, height=bottom_height)
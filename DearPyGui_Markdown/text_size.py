@@ -0,0 +1,144 @@
+import math
+import warnings
+
+from . import get_text_size, TextMeasurer
+
+try:
+    import numpy
+except ModuleNotFoundError:
+    numpy = None
+
+
+class GlyphWidths:
+    """
+    Lazily filled advance-width table per (font, codepoint).
+
+    DearPyGui measures a single line of text as the plain sum of glyph advances,
+    so once every glyph of a font has been measured the width of any string can
+    be computed without calling into DPG.
+    """
+    numpy_min_length = 64  # Shorter strings are faster to sum without numpy
+    table_size = 0x10000  # Codepoints outside the BMP are kept only in the dict
+
+    verify = False  # Compare every measurement against dpg.get_text_size
+    verify_tolerance = 0.01
+    mismatches = 0
+
+    _widths: dict[int | str, dict[str, float]] = {}
+    _tables: dict[int | str, object] = {}
+    _heights: dict[int | str, float] = {}
+
+    @classmethod
+    def clear(cls):
+        cls._widths.clear()
+        cls._tables.clear()
+        cls._heights.clear()
+        TextMeasurer.clear()
+
+    @classmethod
+    def _measure_glyph(cls, char: str, font: int | str) -> float:
+        return get_text_size(char, font=font)[0]
+
+    @classmethod
+    def _add_glyph(cls, char: str, font: int | str, widths: dict[str, float]) -> float:
+        width = cls._measure_glyph(char, font)
+        widths[char] = width
+        table = cls._tables.get(font, None)
+        if table is not None and ord(char) < cls.table_size:
+            table[ord(char)] = width
+        return width
+
+    @classmethod
+    def _get_font_widths(cls, font: int | str) -> dict[str, float]:
+        widths = cls._widths.get(font, None)
+        if widths is None:
+            widths = cls._widths[font] = {}
+        return widths
+
+    @classmethod
+    def _get_font_table(cls, font: int | str):
+        table = cls._tables.get(font, None)
+        if table is None:
+            table = numpy.full(cls.table_size, numpy.nan, dtype=numpy.float32)
+            for char, width in cls._get_font_widths(font).items():
+                if ord(char) < cls.table_size:
+                    table[ord(char)] = width
+            cls._tables[font] = table
+        return table
+
+    @classmethod
+    def get_advance(cls, char: str, font: int | str = 0) -> float:
+        widths = cls._get_font_widths(font)
+        width = widths.get(char, None)
+        if width is None:
+            width = cls._add_glyph(char, font, widths)
+        return width
+
+    @classmethod
+    def get_advances(cls, text: str, font: int | str = 0) -> list[float]:
+        widths = cls._get_font_widths(font)
+        try:
+            return [widths[char] for char in text]
+        except KeyError:
+            for char in set(text):
+                if char not in widths:
+                    cls._add_glyph(char, font, widths)
+            return [widths[char] for char in text]
+
+    @classmethod
+    def _sum_numpy(cls, text: str, font: int | str) -> float | None:
+        codepoints = numpy.frombuffer(text.encode('utf-32-le'), dtype=numpy.uint32)
+        if codepoints.max() >= cls.table_size:
+            return None
+        table = cls._get_font_table(font)
+        advances = table[codepoints]
+        missing = numpy.isnan(advances)
+        if missing.any():
+            widths = cls._get_font_widths(font)
+            for codepoint in numpy.unique(codepoints[missing]):
+                cls._add_glyph(chr(codepoint), font, widths)
+            advances = table[codepoints]
+        return float(advances.sum(dtype=numpy.float64))
+
+    @classmethod
+    def get_width(cls, text: str, font: int | str = 0) -> float:
+        if '\n' in text:
+            return get_text_size(text, font=font)[0]
+
+        width = None
+        if numpy is not None and len(text) >= cls.numpy_min_length:
+            width = cls._sum_numpy(text, font)
+        if width is None:
+            width = math.fsum(cls.get_advances(text, font))
+
+        if cls.verify:
+            cls._verify(text, font, width)
+        return width
+
+    @classmethod
+    def get_height(cls, font: int | str = 0) -> float:
+        height = cls._heights.get(font, None)
+        if height is None:
+            height = cls._heights[font] = get_text_size('Tg,y', font=font)[1]
+        return height
+
+    @classmethod
+    def _verify(cls, text: str, font: int | str, width: float):
+        if not text:
+            return
+        dpg_width = get_text_size(text, font=font)[0]
+        if abs(dpg_width - width) > cls.verify_tolerance:
+            cls.mismatches += 1
+            warnings.warn(f'Cached width {width} differs from DPG width {dpg_width} for {text!r} (font: {font})')
+
+
+def get_text_width(text: str, font: int | str = 0) -> float:
+    return GlyphWidths.get_width(text, font=font)
+
+
+def get_text_advances(text: str, font: int | str = 0) -> list[float]:
+    return GlyphWidths.get_advances(text, font=font)
+
+
+def get_text_height(font: int | str = 0) -> float:
+    return GlyphWidths.get_height(font=font)
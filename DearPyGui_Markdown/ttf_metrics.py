@@ -0,0 +1,386 @@
+import importlib.metadata
+import struct
+
+from .attribute_types import FontAttribute
+
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def uint16(self, offset: int) -> int:
+        return struct.unpack_from('>H', self.data, offset)[0]
+
+    def int16(self, offset: int) -> int:
+        return struct.unpack_from('>h', self.data, offset)[0]
+
+    def uint32(self, offset: int) -> int:
+        return struct.unpack_from('>I', self.data, offset)[0]
+
+    def uint16_array(self, offset: int, count: int) -> tuple[int, ...]:
+        return struct.unpack_from(f'>{count}H', self.data, offset)
+
+
+class _PairAdjustment:
+    """One GPOS pair adjustment subtable (lookup type 2), reduced to the x advance of the first glyph"""
+
+    def __init__(self, reader: _Reader, offset: int):
+        self.pairs: dict[tuple[int, int], int] | None = None
+        self.classes = None
+
+        pos_format = reader.uint16(offset)
+        self.coverage = TTFFont.read_coverage(reader, offset + reader.uint16(offset + 2))
+        value_format1 = reader.uint16(offset + 4)
+        value_format2 = reader.uint16(offset + 6)
+        value1_size = bin(value_format1).count('1') * 2
+        value2_size = bin(value_format2).count('1') * 2
+        x_advance = bin(value_format1 & 0x0003).count('1') * 2 if value_format1 & 0x0004 else None
+
+        if pos_format == 1:
+            self.pairs = {}
+            pair_set_count = reader.uint16(offset + 8)
+            first_glyphs = sorted(self.coverage, key=self.coverage.get)
+            for pair_set_offset, first_glyph in zip(reader.uint16_array(offset + 10, pair_set_count), first_glyphs):
+                pair_set = offset + pair_set_offset
+                record = pair_set + 2
+                for _ in range(reader.uint16(pair_set)):
+                    value = reader.int16(record + 2 + x_advance) if x_advance is not None else 0
+                    self.pairs[(first_glyph, reader.uint16(record))] = value
+                    record += 2 + value1_size + value2_size
+        elif pos_format == 2:
+            class_def1 = TTFFont.read_class_def(reader, offset + reader.uint16(offset + 8))
+            class_def2 = TTFFont.read_class_def(reader, offset + reader.uint16(offset + 10))
+            class1_count = reader.uint16(offset + 12)
+            class2_count = reader.uint16(offset + 14)
+            record_size = value1_size + value2_size
+            values = []
+            for class1 in range(class1_count):
+                row = offset + 16 + class1 * class2_count * record_size
+                values.append([reader.int16(row + class2 * record_size + x_advance) if x_advance is not None else 0
+                               for class2 in range(class2_count)])
+            self.classes = (class_def1, class_def2, values)
+
+    def get(self, left: int, right: int) -> int | None:
+        """:return: kerning of the pair in font units, None if the subtable does not apply to it"""
+        if left not in self.coverage:
+            return None
+        if self.pairs is not None:
+            return self.pairs.get((left, right), None)
+        class_def1, class_def2, values = self.classes
+        return values[class_def1.get(left, 0)][class_def2.get(right, 0)]
+
+
+class TTFFont:
+    """
+    Pure Python reader of the metrics of a TrueType/OpenType font file: the advance
+    widths (hmtx), the character map (cmap formats 4 and 12) and the pair kerning
+    (kern format 0 and GPOS pair adjustment).
+
+    Sizes are scaled the way Dear ImGui builds its font atlas with stb_truetype: a font
+    added with `size` is scaled by size / (ascender - descender) of the hhea table and
+    the advances are not snapped to pixels. Characters of `glyph_ranges` that are not in
+    the font are measured as the fallback character, like DPG does.
+    """
+    glyph_ranges: tuple[tuple[int, int], ...] | None = ((0x0020, 0x00FF),)  # ImGui default ranges, None: all
+    tab_size = 4  # ImGui measures a tab as 4 spaces
+
+    _fonts: dict[str, 'TTFFont'] = {}
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as file:
+            self.reader = _Reader(file.read())
+        self.path = path
+
+        reader = self.reader
+        self.tables: dict[str, int] = {}
+        for i in range(reader.uint16(4)):
+            record = 12 + i * 16
+            self.tables[reader.data[record:record + 4].decode('latin-1')] = reader.uint32(record + 8)
+
+        self.units_per_em = reader.uint16(self.tables['head'] + 18)
+        hhea = self.tables['hhea']
+        self.ascender = reader.int16(hhea + 4)
+        self.descender = reader.int16(hhea + 6)
+        number_of_h_metrics = reader.uint16(hhea + 34)
+        num_glyphs = reader.uint16(self.tables['maxp'] + 4)
+
+        hmtx = self.tables['hmtx']
+        self.advances = [reader.uint16(hmtx + i * 4) for i in range(number_of_h_metrics)]
+        self.advances.extend([self.advances[-1]] * (num_glyphs - number_of_h_metrics))
+
+        self.glyphs = self._read_cmap()
+        self._kerning: list[list] | None = None  # Read on first use
+        self._kerning_cache: dict[tuple[int, int], int] = {}
+
+    @classmethod
+    def open(cls, path: str) -> 'TTFFont':
+        font = cls._fonts.get(path, None)
+        if font is None:
+            font = cls._fonts[path] = cls(path)
+        return font
+
+    @staticmethod
+    def read_coverage(reader: _Reader, offset: int) -> dict[int, int]:
+        """:return: glyph: coverage index"""
+        coverage = {}
+        count = reader.uint16(offset + 2)
+        if reader.uint16(offset) == 1:
+            for index, glyph in enumerate(reader.uint16_array(offset + 4, count)):
+                coverage[glyph] = index
+        else:
+            for i in range(count):
+                start, end, start_index = reader.uint16_array(offset + 4 + i * 6, 3)
+                for glyph in range(start, end + 1):
+                    coverage[glyph] = start_index + glyph - start
+        return coverage
+
+    @staticmethod
+    def read_class_def(reader: _Reader, offset: int) -> dict[int, int]:
+        """:return: glyph: class, glyphs of class 0 are left out"""
+        classes = {}
+        if reader.uint16(offset) == 1:
+            start_glyph = reader.uint16(offset + 2)
+            count = reader.uint16(offset + 4)
+            for i, glyph_class in enumerate(reader.uint16_array(offset + 6, count)):
+                classes[start_glyph + i] = glyph_class
+        else:
+            for i in range(reader.uint16(offset + 2)):
+                start, end, glyph_class = reader.uint16_array(offset + 4 + i * 6, 3)
+                for glyph in range(start, end + 1):
+                    classes[glyph] = glyph_class
+        return classes
+
+    def _read_cmap(self) -> dict[int, int]:
+        reader = self.reader
+        cmap = self.tables['cmap']
+        subtables = {}
+        for i in range(reader.uint16(cmap + 2)):
+            record = cmap + 4 + i * 8
+            subtables[(reader.uint16(record), reader.uint16(record + 2))] = cmap + reader.uint32(record + 4)
+
+        for key in ((3, 10), (0, 6), (0, 4), (3, 1), (0, 3), (0, 2), (0, 1), (0, 0)):
+            offset = subtables.get(key, None)
+            if offset is None:
+                continue
+            match reader.uint16(offset):
+                case 4:
+                    return self._read_cmap_format4(offset)
+                case 12:
+                    return self._read_cmap_format12(offset)
+        raise ValueError(f'{self.path}: no supported unicode cmap subtable')
+
+    def _read_cmap_format4(self, offset: int) -> dict[int, int]:
+        reader = self.reader
+        seg_count = reader.uint16(offset + 6) // 2
+        end_codes = reader.uint16_array(offset + 14, seg_count)
+        start_codes = reader.uint16_array(offset + 16 + seg_count * 2, seg_count)
+        id_deltas = reader.uint16_array(offset + 16 + seg_count * 4, seg_count)
+        id_range_offsets_start = offset + 16 + seg_count * 6
+        id_range_offsets = reader.uint16_array(id_range_offsets_start, seg_count)
+
+        glyphs = {}
+        for i in range(seg_count):
+            for char in range(start_codes[i], end_codes[i] + 1):
+                if char == 0xFFFF:
+                    continue
+                if id_range_offsets[i] == 0:
+                    glyph = (char + id_deltas[i]) & 0xFFFF
+                else:
+                    glyph_offset = id_range_offsets_start + i * 2 + id_range_offsets[i] + (char - start_codes[i]) * 2
+                    glyph = reader.uint16(glyph_offset)
+                    if glyph != 0:
+                        glyph = (glyph + id_deltas[i]) & 0xFFFF
+                if glyph != 0:
+                    glyphs[char] = glyph
+        return glyphs
+
+    def _read_cmap_format12(self, offset: int) -> dict[int, int]:
+        reader = self.reader
+        glyphs = {}
+        for i in range(reader.uint32(offset + 12)):
+            group = offset + 16 + i * 12
+            start_char, end_char, start_glyph = reader.uint32(group), reader.uint32(group + 4), reader.uint32(group + 8)
+            for char in range(start_char, end_char + 1):
+                glyphs[char] = start_glyph + char - start_char
+        return glyphs
+
+    def _read_kerning(self) -> list[list]:
+        """:return: lookups, every lookup is a list of subtables with a `get(left, right)` method"""
+        reader = self.reader
+        lookups = []
+
+        kern = self.tables.get('kern', None)
+        if kern is not None and reader.uint16(kern) == 0:
+            offset = kern + 4
+            for _ in range(reader.uint16(kern + 2)):
+                length, coverage = reader.uint16(offset + 2), reader.uint16(offset + 4)
+                if coverage >> 8 == 0 and coverage & 0x1:  # Horizontal pairs (format 0)
+                    pairs = {}
+                    for i in range(reader.uint16(offset + 6)):
+                        record = offset + 14 + i * 6
+                        pairs[(reader.uint16(record), reader.uint16(record + 2))] = reader.int16(record + 4)
+                    lookups.append([pairs])
+                offset += length
+
+        gpos = self.tables.get('GPOS', None)
+        if gpos is not None:
+            feature_list = gpos + reader.uint16(gpos + 6)
+            lookup_list = gpos + reader.uint16(gpos + 8)
+            lookup_indexes = set()
+            for i in range(reader.uint16(feature_list)):
+                record = feature_list + 2 + i * 6
+                if reader.data[record:record + 4] != b'kern':
+                    continue
+                feature = feature_list + reader.uint16(record + 4)
+                lookup_indexes.update(reader.uint16_array(feature + 4, reader.uint16(feature + 2)))
+
+            for lookup_index in sorted(lookup_indexes):
+                lookup = lookup_list + reader.uint16(lookup_list + 2 + lookup_index * 2)
+                lookup_type = reader.uint16(lookup)
+                subtables = []
+                for subtable_offset in reader.uint16_array(lookup + 6, reader.uint16(lookup + 4)):
+                    subtable = lookup + subtable_offset
+                    subtable_type = lookup_type
+                    if lookup_type == 9:  # Extension
+                        subtable_type = reader.uint16(subtable + 2)
+                        subtable += reader.uint32(subtable + 4)
+                    if subtable_type == 2:
+                        subtables.append(_PairAdjustment(reader, subtable))
+                if len(subtables) != 0:
+                    lookups.append(subtables)
+        return lookups
+
+    def in_glyph_ranges(self, text: str) -> bool:
+        """:return: True if all characters of the text are in `glyph_ranges` (control characters are ignored)"""
+        if self.glyph_ranges is None:
+            return True
+        for char in set(text):
+            codepoint = ord(char)
+            if codepoint < 0x20:
+                continue
+            for start, end in self.glyph_ranges:
+                if start <= codepoint <= end:
+                    break
+            else:
+                return False
+        return True
+
+    def is_loaded(self, char: str) -> bool:
+        """:return: True if DPG loads a glyph for the character"""
+        return ord(char) in self.glyphs and self.in_glyph_ranges(char)
+
+    def get_fallback_glyph(self) -> int:
+        """:return: glyph drawn for the characters that are not loaded, like ImGui chooses it"""
+        for char in ('\ufffd', '?', ' '):
+            if self.is_loaded(char):
+                return self.glyphs[ord(char)]
+        return 0
+
+    def get_glyph(self, char: str) -> int:
+        if self.is_loaded(char):
+            return self.glyphs[ord(char)]
+        return self.get_fallback_glyph()
+
+    def get_kerning(self, left: int, right: int) -> int:
+        """:return: kerning of two glyphs in font units"""
+        key = (left, right)
+        kerning = self._kerning_cache.get(key, None)
+        if kerning is not None:
+            return kerning
+        if self._kerning is None:
+            self._kerning = self._read_kerning()
+
+        kerning = 0
+        for subtables in self._kerning:
+            for subtable in subtables:
+                value = subtable.get(key, None) if isinstance(subtable, dict) else subtable.get(left, right)
+                if value is not None:
+                    kerning += value
+                    break
+        self._kerning_cache[key] = kerning
+        return kerning
+
+    def get_scale(self, size: float | int) -> float:
+        return size / (self.ascender - self.descender)
+
+    def get_advance(self, char: str, size: float | int) -> float:
+        if char == '\t':
+            return self.get_advance(' ', size) * self.tab_size
+        return self.advances[self.get_glyph(char)] * self.get_scale(size)
+
+    def get_width(self, text: str, size: float | int, kerning: bool = False) -> float:
+        """:return: width of one line of text"""
+        units = 0
+        previous_glyph = None
+        for char in text:
+            if char == '\r':
+                continue
+            if char == '\t':
+                units += self.advances[self.get_glyph(' ')] * self.tab_size
+                previous_glyph = None
+                continue
+            glyph = self.get_glyph(char)
+            units += self.advances[glyph]
+            if kerning and previous_glyph is not None:
+                units += self.get_kerning(previous_glyph, glyph)
+            previous_glyph = glyph
+        return units * self.get_scale(size)
+
+    def get_text_size(self, text: str, size: float | int, kerning: bool = False) -> list[float]:
+        """:return: [width, height] like ImGui::CalcTextSize, the line height is the font size"""
+        lines = text.split('\n')
+        width = max(self.get_width(line, size, kerning=kerning) for line in lines)
+        line_count = len(lines)
+        if len(lines[-1]) == 0 and line_count > 1:  # A trailing new line does not start a line
+            line_count -= 1
+        return [width, size * line_count]
+
+
+class TTFTextSize:
+    """
+    Measures the fonts set with `set_font` from their files instead of DPG, so text can
+    be laid out before the first frame, without a viewport or in a worker process.
+
+    `use()` makes TextMeasurer (and so get_text_size and GlyphWidths) measure with it.
+    Fonts that were not created by a FontAttribute, e.g. the default DPG font, and
+    wrapped measurements are still measured by DPG.
+
+    DPG 2 (ImGui 1.92) loads the glyph of every character of a font when it is drawn.
+    DPG 1 loads only the default ranges and the ranges registered with the font (range
+    hints, ranges and chars), which are not read back: texts with characters outside the
+    default ranges are measured by DPG.
+    """
+    kerning = False  # DPG does not kern, so the widths match DPG without kerning
+
+    @classmethod
+    def get_text_size(cls, text: str, *, wrap_width: float = -1.0, font: int | str = 0, **kwargs) -> list[float] | None:
+        """:return: [width, height], None if the font file is not known or DPG may load other glyphs"""
+        font_file = FontAttribute.font_files.get(font, None)
+        if font_file is None or wrap_width > 0:
+            return None
+        path, size = font_file
+        ttf_font = TTFFont.open(path)
+        if not ttf_font.in_glyph_ranges(text):
+            return None
+        return ttf_font.get_text_size(text, size, kerning=cls.kerning)
+
+    @staticmethod
+    def get_glyph_ranges() -> tuple[tuple[int, int], ...] | None:
+        """:return: ranges of the characters DPG loads by default, None if it loads all of them"""
+        try:
+            dpg_version = importlib.metadata.version('dearpygui')
+        except importlib.metadata.PackageNotFoundError:
+            dpg_version = '1'
+        if int(dpg_version.split('.')[0]) >= 2:
+            return None
+        return ((0x0020, 0x00FF),)
+
+    @classmethod
+    def use(cls, enabled: bool = True):
+        from . import TextMeasurer
+        from .text_size import GlyphWidths
+
+        if enabled:
+            TTFFont.glyph_ranges = cls.get_glyph_ranges()
+        TextMeasurer.provider = cls.get_text_size if enabled else None
+        GlyphWidths.clear()
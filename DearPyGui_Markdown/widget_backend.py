@@ -0,0 +1,88 @@
+import dearpygui.dearpygui as dpg
+
+from .attribute_types import DecorationLayer, LinkIndex
+from .layout import DisplayList, DisplayLine, TextRun, Rect, Line, Circle, Polyline
+from .line_atributes import Separator
+from .text_entities import AttributeController, LineEntity
+
+
+class WidgetText:
+    """
+    Renders the DisplayList of a wrapped LineEntity as text items, one horizontal group
+    per line, and draws the other items into the DecorationLayer of the text group.
+
+    Positions come from the display list: a line starts with a spacer as wide as its
+    blockquotes and list markers, and a text lower than the top of its line is put under
+    a spacer. Lines are rendered one by one (see LineEntity.render), so a long text can
+    be rendered over several frames.
+    """
+
+    def __init__(self, print_text: LineEntity | DisplayList, parent=0, attributes_group=0,
+                 origin: list | tuple | None = None):
+        """
+        :param print_text: wrapped text, or its already computed DisplayList
+        :param parent: text group
+        :param origin: position of `parent` in window coordinates, if it is known before it is drawn
+        """
+        display_list = print_text
+        if not isinstance(display_list, DisplayList):
+            display_list = DisplayList.create(print_text)
+        self.display_list = display_list
+        self.parent = parent
+        self.attributes_group = attributes_group
+        self.layer = DecorationLayer.create(parent, attributes_group, origin)
+        LinkIndex.create(parent)
+
+    def render_line(self, line: DisplayLine):
+        if line.separator:
+            Separator.render(parent=self.parent)
+            return
+
+        with dpg.group(horizontal=True, parent=self.parent) as group:
+            x = line.runs[0].x if len(line.runs) != 0 else 0
+            dpg.add_spacer(width=int(x), height=int(line.height), parent=group)
+            for run in line.runs:
+                self._add_text(run, line, parent=group)
+        dpg.bind_item_theme(group, AttributeController.get_group_theme())
+
+        for item in line.decorations:
+            self._draw(item)
+
+    def _add_text(self, run: TextRun, line: DisplayLine, parent=0):
+        if run.y > line.y:
+            with dpg.group(parent=parent) as parent:
+                dpg.add_spacer(height=int(run.y - line.y), parent=parent)
+        dpg_text = dpg.add_text(run.text, color=run.color, parent=parent)
+        if run.font is not None:
+            dpg.bind_item_font(dpg_text, run.font)
+        if run.link is not None:
+            run.link.render(dpg_text, (run.x, run.y, run.width, run.height), parent=self.attributes_group)
+
+    @staticmethod
+    def _fill(item: Rect | Circle) -> dict:
+        return {} if item.fill is None else {'fill': item.fill}
+
+    def _draw(self, item):
+        layer = self.layer
+        match item:
+            case TextRun():  # List marker
+                layer.draw_text([item.x, item.y], item.text, item.width, item.height, size=item.size, font=item.font,
+                                color=item.color)
+            case Line():
+                dpg_line = layer.draw_line([item.x0, item.y0], [item.x1, item.y1], color=item.color,
+                                           thickness=item.thickness)
+                if item.link is not None:
+                    item.link.line_color = item.color
+                    item.link.underline_objects.append(dpg_line)
+            case Rect() if item.rounding != 0:
+                layer.draw_rectangle([item.x0, item.y0], [item.x1, item.y1], color=item.color, thickness=item.thickness,
+                                     rounding=item.rounding, background=item.background, **self._fill(item))
+            case Rect():
+                layer.draw_quad([item.x0, item.y0], [item.x1, item.y0], [item.x1, item.y1], [item.x0, item.y1],
+                                color=item.color, thickness=item.thickness, background=item.background,
+                                **self._fill(item))
+            case Circle():
+                layer.draw_circle([item.x, item.y], item.radius, color=item.color, thickness=item.thickness,
+                                  **self._fill(item))
+            case Polyline():
+                layer.draw_polyline(item.points, color=item.color, thickness=item.thickness)
@@ -0,0 +1,56 @@
+"""
+Memory kept by a parsed document and the time to wrap it, for documents of 10 KB to
+400 KB. The memory of the whole MarkdownText (with its attributes) is printed, and the
+memory of its text alone: as a SpanText and, for comparison, as a TextEntity of
+StrEntity runs, the model before SpanText. Both share the same attributes.
+
+    python benchmarks/bench_document.py
+"""
+import gc
+import os
+import sys
+import tracemalloc
+
+from common import best_time, dpg_markdown, root_path, setup
+
+sys.path.append(os.path.join(root_path, 'example'))
+import test_text  # noqa
+
+wrap_width = 400
+
+
+def get_retained_size(function, *args) -> tuple[object, int]:
+    """:return: result of the call and the bytes still allocated by it after the call"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = function(*args)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    setup()
+    print(f'{"KB":>5} {"MarkdownText KB":>16} {"SpanText KB":>12} {"B/char":>7} {"runs KB":>8} {"B/char":>7} '
+          f'{"wrap ms":>8}')
+    for size_kb in (10, 100, 400):
+        markdown_text = (test_text.text * (size_kb * 1024 // len(test_text.text) + 1))[:size_kb * 1024]
+        markdown_text = markdown_text[:markdown_text.rfind('\n\n')]  # Do not cut a block
+        dpg_markdown.parser.parse(markdown_text)  # The parse cache is not counted
+
+        markdown, markdown_size = get_retained_size(dpg_markdown.MarkdownText, markdown_text)
+        runs, runs_size = get_retained_size(markdown.text_entity.to_entity)
+        text_entity, span_size = get_retained_size(dpg_markdown.text_entities.SpanText.from_entity, runs)
+        wrap_time = best_time(dpg_markdown.wrap_text_entity, text_entity, wrap_width)
+
+        char_count = text_entity.length
+        print(f'{len(markdown_text) / 1024:>5.0f} {markdown_size / 1024:>16.0f} {span_size / 1024:>12.0f} '
+              f'{span_size / char_count:>7.1f} {runs_size / 1024:>8.0f} {runs_size / char_count:>7.1f} '
+              f'{wrap_time * 1000:>8.1f}')
+        del markdown, runs, text_entity
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Joining the words of a paragraph into one line with `+` (TextEntity.__add__ copies the
+whole line on every step) and with LineBuilder (appends in place, freezes once).
+
+The time and the peak memory traced by tracemalloc are printed. The copies of `+` are
+freed right away, so they show in its time, which grows quadratically, more than in its
+peak. The builder keeps the texts of every run in a list until it freezes the line, so
+its peak is the higher one.
+
+    python benchmarks/bench_line_builder.py
+"""
+import time
+import tracemalloc
+
+from common import dpg_markdown, setup
+
+text_entities = dpg_markdown.text_entities
+
+
+def get_words(word_count: int) -> list:
+    words = ('lorem ', 'ipsum ', '**dolor** ', 'sit ', '*amet* ', 'consectetur ', '`adipiscing` ')
+    markdown_text = ''.join(words[i % len(words)] for i in range(word_count))
+    runs = dpg_markdown.MarkdownText(markdown_text).text_entity.to_entity()
+    return text_entities.TextEntity(runs).split(' ')
+
+
+def join_with_add(words: list):
+    line = words[0]
+    for word in words[1::]:
+        line = line + word
+    return line
+
+
+def join_with_builder(words: list):
+    builder = text_entities.LineBuilder()
+    for word in words:
+        builder.append_entity(word)
+    return builder.freeze()
+
+
+def trace(function, *args) -> tuple[float, int]:
+    """:return: seconds and peak traced bytes of the call"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    function(*args)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    setup()
+    print(f'{"words":>6} {"+ ms":>9} {"+ peak KB":>10} {"builder ms":>11} {"builder peak KB":>16}')
+    for word_count in (500, 1000, 2000, 4000):
+        words = get_words(word_count)
+        add_time, add_peak = trace(join_with_add, words)
+        builder_time, builder_peak = trace(join_with_builder, words)
+        print(f'{word_count:>6} {add_time * 1000:>9.1f} {add_peak / 1024:>10.0f} '
+              f'{builder_time * 1000:>11.1f} {builder_peak / 1024:>16.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""
+Time of MarkdownText.__init__ for synthetic documents with up to 10k entities (inline
+styles, links and list items). The document is parsed once before timing, so the timed
+part is the segmentation of the text by its entities (plus copying the cached parse).
+With the sort-and-sweep segmentation the time per entity stays about the same.
+
+    python benchmarks/bench_segmentation.py
+"""
+from common import best_time, dpg_markdown, setup
+
+parser = dpg_markdown.parser
+
+
+def get_document(repeat: int) -> str:
+    line = '- **bold** *italic* `code` [link](http://example.com) ~~strike~~ <u>under</u> text\n'
+    return line * repeat
+
+
+def main():
+    setup()
+    print(f'{"entities":>9} {"parse ms":>9} {"init ms":>9} {"us/entity":>10}')
+    for repeat in (300, 600, 1200, 1700):
+        markdown_text = get_document(repeat)
+        parser.ParseCache.clear()
+        parse_time = best_time(parser.parse, markdown_text, repeat=1)
+        entity_count = len(parser.parse(markdown_text)[1])
+        init_time = best_time(dpg_markdown.MarkdownText, markdown_text)
+        print(f'{entity_count:>9} {parse_time * 1000:>9.1f} {init_time * 1000:>9.1f} '
+              f'{init_time / entity_count * 1e6:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
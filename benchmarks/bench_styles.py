@@ -0,0 +1,63 @@
+"""
+Speedup of wrap_text_entity from the memoized font, color and height of the interned
+AttributeController, against resolving them on every query like before it was
+interned. Also prints how many styles the runs of the document share.
+
+    python benchmarks/bench_styles.py
+"""
+import os
+import sys
+
+from common import best_time, dpg_markdown, root_path, setup
+
+sys.path.append(os.path.join(root_path, 'example'))
+import test_text  # noqa
+
+AttributeController = dpg_markdown.text_entities.AttributeController
+wrap_width = 400
+
+
+class ResolvedOnEveryQuery:
+    """Makes AttributeController resolve its font, color and height on every query"""
+
+    def __enter__(self):
+        self.methods = {name: getattr(AttributeController, name) for name in ('get_font', 'get_color', 'get_height')}
+        AttributeController.get_font = lambda self: (self._resolve(), self.font)[1]
+        AttributeController.get_color = lambda self: (self._resolve(), self.text_color)[1]
+        AttributeController.get_height = lambda self: (self._resolve(), self.height)[1]
+
+    def __exit__(self, *args):
+        for name, method in self.methods.items():
+            setattr(AttributeController, name, method)
+
+
+def query_styles(styles: list):
+    for style in styles:
+        style.get_font()
+        style.get_color()
+        style.get_height()
+
+
+def main():
+    setup()
+    text_entity = dpg_markdown.MarkdownText(test_text.text * 4).text_entity
+    run_count = len(text_entity.starts)
+    style_count = len(text_entity.styles)
+    print(f'{run_count} runs share {style_count} interned styles')
+
+    styles = [text_entity.styles[style_id] for style_id in text_entity.style_ids] * 20
+    memoized = best_time(query_styles, styles)
+    with ResolvedOnEveryQuery():
+        resolved = best_time(query_styles, styles)
+    print(f'{len(styles)} font, color and height queries: resolved on every query {resolved * 1000:.1f} ms, '
+          f'memoized {memoized * 1000:.1f} ms, speedup {resolved / memoized:.1f}x')
+
+    memoized = best_time(dpg_markdown.wrap_text_entity, text_entity, wrap_width)
+    with ResolvedOnEveryQuery():
+        resolved = best_time(dpg_markdown.wrap_text_entity, text_entity, wrap_width)
+    print(f'wrap_text_entity: resolved on every query {resolved * 1000:.1f} ms, '
+          f'memoized {memoized * 1000:.1f} ms, speedup {resolved / memoized:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
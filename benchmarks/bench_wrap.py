@@ -0,0 +1,34 @@
+"""
+Time of wrap_text_entity for one paragraph of a growing number of words, and for one
+word without spaces that is split by characters. With a linear line breaker the time
+per word (or per character) stays about the same as the paragraph grows.
+
+    python benchmarks/bench_wrap.py
+"""
+from common import best_time, dpg_markdown, setup
+
+wrap_width = 400
+
+
+def get_paragraph(word_count: int) -> str:
+    words = ('lorem', 'ipsum', '**dolor**', 'sit', '*amet*', 'consectetur', '`adipiscing`')
+    return ' '.join(words[i % len(words)] for i in range(word_count))
+
+
+def main():
+    setup()
+    print(f'{"words":>8} {"ms":>9} {"us/word":>9}')
+    for word_count in (1000, 2000, 4000, 8000, 16000):
+        text_entity = dpg_markdown.MarkdownText(get_paragraph(word_count)).text_entity
+        elapsed = best_time(dpg_markdown.wrap_text_entity, text_entity, wrap_width)
+        print(f'{word_count:>8} {elapsed * 1000:>9.1f} {elapsed / word_count * 1e6:>9.2f}')
+
+    print(f'\n{"chars":>8} {"ms":>9} {"us/char":>9}')
+    for char_count in (5000, 10000, 20000, 40000):
+        text_entity = dpg_markdown.MarkdownText('x' * char_count).text_entity
+        elapsed = best_time(dpg_markdown.wrap_text_entity, text_entity, wrap_width)
+        print(f'{char_count:>8} {elapsed * 1000:>9.1f} {elapsed / char_count * 1e6:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Setup shared by the benchmarks. Text is measured from the example font files
+(ttf_metrics.TTFTextSize), so the benchmarks need a DPG context but no viewport.
+"""
+import os
+import sys
+import time
+
+import dearpygui.dearpygui as dpg
+
+try:
+    import DearPyGui_Markdown as dpg_markdown
+except ModuleNotFoundError:
+    # import from parent folder
+    current = os.path.dirname(os.path.realpath(__file__))
+    sys.path.append(os.path.dirname(current))
+    import DearPyGui_Markdown as dpg_markdown
+
+root_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+fonts_path = os.path.join(root_path, 'example', 'fonts')
+
+
+def setup(font_size: int = 18):
+    dpg.create_context()
+    dpg_markdown.set_font_registry(dpg.add_font_registry())
+    dpg_markdown.set_font(font_size=font_size,
+                          default=os.path.join(fonts_path, 'InterTight-Regular.ttf'),
+                          bold=os.path.join(fonts_path, 'InterTight-Bold.ttf'),
+                          italic=os.path.join(fonts_path, 'InterTight-Italic.ttf'),
+                          italic_bold=os.path.join(fonts_path, 'InterTight-BoldItalic.ttf'))
+    dpg_markdown.ttf_metrics.TTFTextSize.use()
+
+
+def best_time(function, *args, repeat: int = 3) -> float:
+    """:return: the shortest of `repeat` calls, in seconds"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
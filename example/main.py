@@ -1,3 +1,6 @@
+import threading
+import time
+
 import dearpygui.dearpygui as dpg
 
 try:
@@ -14,6 +17,8 @@ import font
 import test_text
 
 wrap_width = -1
+added_texts: list[tuple[dpg_markdown.MarkdownText, int]] = []
+added_streams: list[dpg_markdown.MarkdownStream] = []
 
 dpg.create_context()
 dpg.create_viewport(title='Markdown example', width=900, height=900)
@@ -27,11 +32,28 @@ def clear_input():
 
 def add():
     text = dpg.get_value('markdown_input')
-    dpg_markdown.add_text(text, parent='view_window', wrap=wrap_width)
+    markdown_text = dpg_markdown.MarkdownText(text)
+    group = markdown_text.add(wrap=wrap_width, parent='view_window')
+    added_texts.append((markdown_text, group))
+
+
+def stream():
+    text = dpg.get_value('markdown_input')
+    markdown_stream = dpg_markdown.MarkdownStream(wrap=wrap_width, parent='view_window')
+    added_streams.append(markdown_stream)
+
+    def worker():  # Imitates a response that arrives a few characters at a time
+        for i in range(0, len(text), 4):
+            markdown_stream.append(text[i:i + 4])
+            time.sleep(0.005)
+
+    threading.Thread(target=worker, daemon=True).start()
 
 
 def clear():
     dpg.delete_item('view_window', children_only=True)
+    added_texts.clear()
+    added_streams.clear()
 
 
 def clear_and_add():
@@ -43,6 +65,11 @@ def set_wrap_width(width: int | float):
     global wrap_width
     wrap_width = width
 
+    for markdown_text, group in added_texts:
+        markdown_text.reflow(group, wrap=wrap_width)
+    for markdown_stream in added_streams:
+        markdown_stream.reflow(wrap=wrap_width)
+
     if width < 0:
         dpg.configure_item('end_wrap_indicator', show=False)
         return
@@ -67,6 +94,7 @@ with dpg.window() as window:
                 dpg.add_button(label='Clear', callback=clear)
                 dpg.add_button(label='Add', callback=add)
                 dpg.add_button(label='C+A', callback=clear_and_add)
+                dpg.add_button(label='Stream', callback=stream)
 
     with dpg.table(resizable=True, header_row=False):
         dpg.add_table_column(init_width_or_weight=0.5)
@@ -82,7 +110,8 @@ with dpg.window() as window:
                         dpg_markdown.add_text_italic('|', tag='start_wrap_indicator')
                         dpg_markdown.add_text_italic('|', tag='end_wrap_indicator', show=wrap_width > 0)
                 with dpg.child_window(width=-1, height=-2, tag='view_window'):
-                    dpg_markdown.add_text(test_text.text)
+                    markdown_text = dpg_markdown.MarkdownText(test_text.text)
+                    added_texts.append((markdown_text, markdown_text.add()))
 
 dpg.set_primary_window(window, True)
 dpg.show_viewport()
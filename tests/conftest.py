@@ -0,0 +1,28 @@
+import os
+
+import dearpygui.dearpygui as dpg
+import pytest
+
+import DearPyGui_Markdown as dpg_markdown
+
+FONTS_PATH = os.path.join(os.path.dirname(__file__), '..', 'example', 'fonts')
+
+
+@pytest.fixture(scope='session')
+def window():
+    """
+    Window in a DPG context without a viewport. Text is measured from the example font files
+    (ttf_metrics.TTFTextSize). The themes of the package are created once, so the context is
+    shared by all the tests.
+    """
+    dpg.create_context()
+    dpg_markdown.set_font_registry(dpg.add_font_registry())
+    dpg_markdown.set_font(font_size=18,
+                          default=os.path.join(FONTS_PATH, 'InterTight-Regular.ttf'),
+                          bold=os.path.join(FONTS_PATH, 'InterTight-Bold.ttf'),
+                          italic=os.path.join(FONTS_PATH, 'InterTight-Italic.ttf'),
+                          italic_bold=os.path.join(FONTS_PATH, 'InterTight-BoldItalic.ttf'))
+    dpg_markdown.ttf_metrics.TTFTextSize.use()
+    with dpg.window() as window:
+        yield window
+    dpg_markdown.ttf_metrics.TTFTextSize.use(False)
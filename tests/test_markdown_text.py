@@ -0,0 +1,68 @@
+import dearpygui.dearpygui as dpg
+import pytest
+
+import DearPyGui_Markdown as dpg_markdown
+from DearPyGui_Markdown import layout
+
+
+@pytest.fixture
+def next_frame(monkeypatch):
+    """Calls queued for the next frame, run by the test instead of a rendered frame"""
+    queue = []
+    monkeypatch.setattr(dpg_markdown.CallWhenDPGStarted, 'STARTUP_DONE', True)
+    monkeypatch.setattr(dpg_markdown.CallInNextFrame, 'append',
+                        classmethod(lambda cls, func, *args, **kwargs: queue.append((func, args, kwargs))))
+    return queue
+
+
+def test_layout_is_retried_when_render_cannot_measure(window, next_frame, monkeypatch):
+    create = layout.DisplayList.create
+    calls = []
+
+    def create_once_not_ready(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise dpg_markdown.TextSizeNotReady()
+        return create(*args, **kwargs)
+
+    monkeypatch.setattr(layout.DisplayList, 'create', create_once_not_ready)
+    markdown = dpg_markdown.MarkdownText('Text\n\n1. first\n2. second')
+    group = markdown.add(wrap=300, parent=window, render_on_element_visible=False)
+    assert len(calls) == 1
+    assert group in markdown.pending_layouts
+    text_group = dpg.get_item_children(group, 1)[0]
+    assert len(dpg.get_item_children(text_group, 1)) == 0
+
+    while len(next_frame) != 0:
+        func, args, kwargs = next_frame.pop(0)
+        func(*args, **kwargs)
+    assert len(calls) == 2
+    assert group not in markdown.pending_layouts
+    assert len(dpg.get_item_children(text_group, 1)) == len(markdown.get_display_list(300).lines)
+
+
+def _get_bullets(display_list: layout.DisplayList) -> list:
+    return [item for line in display_list.lines for item in line.decorations if isinstance(item, layout.Circle)]
+
+
+def test_wrappings_do_not_share_render_state(window):
+    markdown = dpg_markdown.MarkdownText('- a list item long enough to be wrapped\n\n[link](https://example.com)')
+    first = dpg_markdown.wrap_text_entity(markdown.text_entity, 100)
+    second = dpg_markdown.wrap_text_entity(markdown.text_entity, 300)
+    assert set(map(id, first.connectors.values())).isdisjoint(map(id, second.connectors.values()))
+    # A wrapping does not take the list item of another wrapping for its first line
+    assert len(_get_bullets(markdown.get_display_list(100))) == 1
+    assert len(_get_bullets(markdown.get_display_list(300))) == 1
+
+
+def test_widths_cache_is_cleared_when_font_changes(window, monkeypatch):
+    markdown = dpg_markdown.MarkdownText('First paragraph\n\nSecond paragraph')
+    markdown.get_display_list(200)
+    assert len(markdown.widths_cache) != 0
+    markdown.widths_cache['stale'] = []
+
+    FontAttribute = dpg_markdown.font_attributes.FontAttribute
+    monkeypatch.setattr(FontAttribute, 'generation', FontAttribute.generation + 1)
+    markdown.get_display_list(200)
+    assert 'stale' not in markdown.widths_cache
+    assert len(markdown.widths_cache) != 0
@@ -0,0 +1,156 @@
+import random
+import time
+
+import pytest
+
+from DearPyGui_Markdown import parser
+from DearPyGui_Markdown.parser import MessageEntity
+
+
+def _reference_strip_text(text, entities):
+    """_strip_text before it was made a single pass, stripping one character at a time"""
+    if not entities:
+        return text.strip()
+    while text and text[-1].isspace():
+        e = entities[-1]
+        if e.offset + e.length == len(text):
+            if e.length == 1:
+                del entities[-1]
+                if not entities:
+                    return text.strip()
+            else:
+                e.length -= 1
+        text = text[:-1]
+
+    while text and text[0].isspace():
+        for i in reversed(range(len(entities))):
+            e = entities[i]
+            if e.offset != 0:
+                e.offset -= 1
+                continue
+
+            if e.length == 1:
+                del entities[0]
+                if not entities:
+                    return text.lstrip()
+            else:
+                e.length -= 1
+
+        text = text[1:]
+
+    return text
+
+
+FRAGMENTS = ["# head", "plain text", "**bold**", "*it*", "~~del~~", "`code`", "[link](http://x.com)", "> quote",
+             ">> deep", "- item", "- [x] done", "1. one", "  - nested", "    1. nn", "---", "***", "```\ncode\n```",
+             "```py\nx = 1\n```", "    indented code", "line  \nbreak", "<u>under</u>", "<font color=\"#ff0000\" size=30>red</font>",
+             "![img](x.png)", "|a|b|\n|-|-|\n|1|2|", "  leading", "trailing   ", "   ", "\n", "\n\n"]
+
+
+def _documents(count: int, seed: int = 0):
+    rnd = random.Random(seed)
+    for _ in range(count):
+        yield rnd.choice(["\n", "\n\n", " ", ""]).join(rnd.choice(FRAGMENTS) for _ in range(rnd.randint(1, 8)))
+
+
+def _random_entities(rnd: random.Random, length: int) -> list[MessageEntity]:
+    """Non-overlapping entities in parse order, empty ones included"""
+    entities = []
+    offset = rnd.randint(0, length)
+    while offset <= length and len(entities) < 5:
+        entity_length = rnd.randint(0, length - offset)
+        entities.append(MessageEntity(offset=offset, length=entity_length))
+        offset += entity_length + rnd.randint(0, 3)
+    return entities
+
+
+def _coverage(text: str, entities: list[MessageEntity], key=id) -> list[list]:
+    """:return: for every character, the keys of the entities covering it"""
+    return [[key(e) for e in entities if e.offset <= i < e.offset + e.length] for i in range(len(text))]
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_strip_text_matches_reference(seed):
+    rnd = random.Random(seed)
+    for _ in range(20000):
+        text = ''.join(rnd.choice(' \n\tab') for _ in range(rnd.randint(0, 14)))
+        entities = _random_entities(rnd, len(text))
+        tags = {id(e): index for index, e in enumerate(entities)}
+        reference = [MessageEntity(offset=e.offset, length=e.length) for e in entities]
+        reference_tags = {id(e): index for index, e in enumerate(reference)}
+        all_filled = all(e.length > 0 for e in entities)
+
+        stripped = parser._strip_text(text, entities)
+        assert stripped == _reference_strip_text(text, reference)
+        assert all(e.length >= 0 and e.offset >= 0 for e in entities)
+        assert all(e.offset + e.length <= len(stripped) for e in entities if e.length != 0)
+
+        if all_filled:  # The reference leaves empty entities with negative lengths
+            assert [(tags[id(e)], e.offset, e.length) for e in entities] == \
+                   [(reference_tags[id(e)], e.offset, e.length) for e in reference]
+        assert _coverage(stripped, entities, key=lambda e: tags[id(e)]) == \
+               _coverage(stripped, reference, key=lambda e: reference_tags[id(e)])
+
+
+def test_strip_text_drops_empty_entities_inside_leading_whitespace():
+    text, entities = parser.parse('> ```py\nx=1\n```\nhello world')
+    assert text == 'x=1\nhello world'
+    assert all(e.length >= 0 for e in entities)
+
+
+def test_strip_text_keeps_trailing_separators_apart():
+    text, entities = parser.parse('quote\n\n---\n\n---')
+    separators = [e for e in entities if isinstance(e, parser.MessageEntitySeparator)]
+    assert text == 'quote'
+    assert len(separators) == 2 and separators[0].offset != separators[1].offset
+
+
+def test_parse_matches_reference_strip_text(monkeypatch):
+    documents = list(_documents(300))
+    results = [parser._parse(document) for document in documents]  # Not cached, so the reference parses again
+    monkeypatch.setattr(parser, '_strip_text', _reference_strip_text)
+    for document, (text, entities) in zip(documents, results):
+        reference_text, reference_entities = parser._parse(document)
+        assert text == reference_text
+        assert all(e.length >= 0 for e in entities)
+        assert _coverage(text, entities, key=type) == _coverage(text, reference_entities, key=type)
+
+
+def test_parse_cache_does_not_share_font_colors():
+    parser.ParseCache.clear()
+    markdown_text = '<font size=20>big</font>'
+    _, entities = parser.parse(markdown_text)
+    font = next(e for e in entities if isinstance(e, parser.MessageEntityFont))
+    font.color[0] = 0
+
+    _, cached_entities = parser.parse(markdown_text)
+    cached_font = next(e for e in cached_entities if isinstance(e, parser.MessageEntityFont))
+    assert parser.ParseCache.hits == 1
+    assert cached_font.color == [255, 255, 255, 255]
+    assert cached_font.color is not font.color
+
+
+def test_link_definitions_resolve_references_of_another_text():
+    definitions = parser.get_link_definitions('[Home]: http://a "Title"\n[b c]: <http://b> \'"q"\'\n\ntext\n')
+    text, entities = parser.parse(definitions + '\n[home] and [B  C]')
+    assert text == 'home and B  C'
+    assert [e.url for e in entities if isinstance(e, parser.MessageEntityTextUrl)] == ['http://a', 'http://b']
+
+
+def _html_parse_time(line_count: int) -> float:
+    """Best of two parses of `line_count` lines inside five open tags, every line with its own tags"""
+    html_text = '<blockquote><blockquote><ul><li><b>' + '<i>word</i> line\n' * line_count + '</b></li></ul></blockquote></blockquote>'
+    best = None
+    for _ in range(2):
+        started = time.perf_counter()
+        html_parser = parser._HTMLToParser()
+        html_parser.feed(html_text)
+        assert len(html_parser.text) == line_count * len('word line\n')
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def test_html_parse_time_is_linear():
+    # A quadratic parser takes 4 times as long for twice the lines
+    assert _html_parse_time(100_000) < _html_parse_time(50_000) * 3
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+import DearPyGui_Markdown as dpg_markdown
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'example'))
+import test_text  # noqa
+
+
+@pytest.fixture(autouse=True)
+def no_layout(monkeypatch):
+    # Only the parsed blocks are compared, nothing is laid out
+    monkeypatch.setattr(dpg_markdown.CallInNextFrame, 'append', classmethod(lambda cls, *args, **kwargs: None))
+
+
+@pytest.mark.parametrize('chunk_size', (1, 3, 4))
+def test_stream_matches_markdown_text(window, chunk_size):
+    stream = dpg_markdown.MarkdownStream(parent=window)
+    for i in range(0, len(test_text.text), chunk_size):
+        stream.append(test_text.text[i:i + chunk_size:])
+        stream._update()
+    text = '\n'.join(markdown.text_entity.text for markdown, group in stream.blocks + [stream.tail])
+    assert text == dpg_markdown.MarkdownText(test_text.text).text_entity.text
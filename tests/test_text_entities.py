@@ -0,0 +1,15 @@
+from DearPyGui_Markdown.attribute_types import AttributeConnector
+from DearPyGui_Markdown.line_atributes import Blockquote, List
+from DearPyGui_Markdown.text_attributes import Code
+from DearPyGui_Markdown.text_entities import StrEntity
+
+
+def test_recreate_attributes_keeps_order():
+    entity = StrEntity('text')
+    entity.set_attributes([Blockquote(1, AttributeConnector()), List(1, AttributeConnector()),
+                           List(2, AttributeConnector()), Code])
+    before = [(type(attribute), getattr(attribute, 'depth', None)) for attribute in entity.attributes]
+
+    for _ in range(3):  # Once per wrapped line
+        entity.recreate_attributes()
+        assert [(type(attribute), getattr(attribute, 'depth', None)) for attribute in entity.attributes] == before
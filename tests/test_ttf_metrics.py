@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from DearPyGui_Markdown.ttf_metrics import TTFFont, TTFTextSize
+
+FONT_PATH = os.path.join(os.path.dirname(__file__), '..', 'example', 'fonts', 'InterTight-Regular.ttf')
+SIZES = (13, 25)
+TEXTS = ('Hello, World!', 'The quick brown fox jumps over the lazy dog', 'Ünïcödé ß ±', 'Привет, мир',
+         'tab\there', 'Wave ~ AVAW 1234567890', '漢字 and text')
+
+# DPG measures text only with a viewport that has rendered a frame, so it runs in its own process
+_DPG_SCRIPT = '''
+import json, sys
+import dearpygui.dearpygui as dpg
+
+path, sizes, texts = json.loads(sys.argv[1])
+dpg.create_context()
+with dpg.font_registry():
+    fonts = [dpg.add_font(path, size) for size in sizes]
+dpg.create_viewport(width=200, height=200)
+dpg.setup_dearpygui()
+dpg.render_dearpygui_frame()
+print(json.dumps([[dpg.get_text_size(text, font=font) for text in texts] for font in fonts]))
+'''
+
+
+def _get_dpg_sizes():
+    arguments = json.dumps([FONT_PATH, SIZES, TEXTS])
+    try:
+        result = subprocess.run([sys.executable, '-c', _DPG_SCRIPT, arguments], capture_output=True, text=True,
+                                timeout=60)
+    except subprocess.TimeoutExpired:
+        return None
+    if result.returncode != 0:
+        return None
+    sizes = json.loads(result.stdout.splitlines()[-1])
+    if any(size is None for font_sizes in sizes for size in font_sizes):
+        return None
+    return sizes
+
+
+def test_widths_match_dpg(monkeypatch):
+    dpg_sizes = _get_dpg_sizes()
+    if dpg_sizes is None:
+        pytest.skip('DPG can not measure text here (no display)')
+    monkeypatch.setattr(TTFFont, 'glyph_ranges', TTFTextSize.get_glyph_ranges())
+
+    font = TTFFont(FONT_PATH)
+    for size, font_sizes in zip(SIZES, dpg_sizes):
+        for text, (dpg_width, _) in zip(TEXTS, font_sizes):
+            if not font.in_glyph_ranges(text):
+                continue  # Measured by DPG
+            assert abs(font.get_width(text, size) - dpg_width) <= 1, (text, size)
+
+
+def test_characters_outside_glyph_ranges_are_measured_by_dpg(monkeypatch):
+    monkeypatch.setattr(TTFFont, 'glyph_ranges', ((0x0020, 0x00FF),))
+    font = TTFFont(FONT_PATH)
+    assert font.in_glyph_ranges('Ünïcödé\n')
+    assert not font.in_glyph_ranges('Привет')
+    assert font.get_width('Привет', 13) == font.get_width('??????', 13)  # '�' is not loaded either
+
+    monkeypatch.setattr(TTFFont, 'glyph_ranges', None)
+    assert font.in_glyph_ranges('Привет')
+    assert font.get_width('Привет', 13) != font.get_width('??????', 13)